@@ -1,14 +1,13 @@
 import streamlit as st
 import streamlit_authenticator as stauth
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
-import yaml
-from yaml.loader import SafeLoader
+import copy
+import time
 from datetime import datetime
-import bcrypt
 
 # ── IMPORTS FROM YOUR SRC FOLDER ───────────────────────────────────
+from src.auth_store import load_credentials, user_roles, CREDENTIALS_PATH, ADMIN_ROLE
 from src.data_loader import load_data
 from src.fb_ads_loader import load_fb_ads_data
 from src.eda import (
@@ -16,12 +15,19 @@ from src.eda import (
     plot_yoy_trend,
     plot_pareto_products,
     plot_category_sunburst,
-    plot_price_vs_volume
+    plot_price_vs_volume,
+    cached_figure
 )
 from src.insights_ai import generate_ai_insights
-from src.predictor import predict_top5_products_next30days, recommend_prices
+from src.predictor import predict_top5_products_next30days, recommend_prices, FORECAST_BACKEND
 from src.facebook_integraation import generate_ad_suggestions
 from src.pack_generator import suggest_packs  # <--- NEW FEATURE IMPORT
+from src.product_summary import build_product_summary
+from src.dataset_store import content_hash, load_cached_dataset, save_cached_dataset
+from src.session import open_dataset, current_dataset
+from src.jobs import JobQueue, JOBS_DB_PATH, DONE, FAILED
+from src.startup_timing import profile_imports, STARTUP_TARGET_MS
+from src.tracing import trace, collect, recent_spans, spans_frame, start_profile, stop_profile
 
 # ── 1. PAGE CONFIGURATION (Must be first) ──────────────────────────
 st.set_page_config(
@@ -32,33 +38,15 @@ st.set_page_config(
 )
 
 # ── 2. SAAS AUTHENTICATION (Universal Fix) ─────────────────────────
-users = [
-    ('admin', 'Admin User', '123', 'admin@company.tn'),
-    ('client', 'Tunisia Client', '456', 'client@shop.tn')
-]
-
-# Manual Hashing
-hashed_passwords = []
-for u in users:
-    plain_password = u[2]
-    pwd_bytes = plain_password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(pwd_bytes, salt).decode('utf-8')
-    hashed_passwords.append(hashed)
-
-# Config Dictionary
-credentials = {'usernames': {}}
-for (username, name, _, email), hash_pass in zip(users, hashed_passwords):
-    credentials['usernames'][username] = {
-        'name': name,
-        'password': hash_pass,
-        'email': email
-    }
-
-config = {
-    'credentials': credentials,
-    'cookie': {'expiry_days': 30, 'key': 'random_signature_key', 'name': 'sales_ai_cookie'},
-}
+# Accounts are pre-hashed in config.yaml and read once per process (again only
+# when the file changes, e.g. after `python -m src.auth_store add ...`),
+# so no bcrypt work happens on a rerun.
+@st.cache_resource
+def get_auth_config(mtime):
+    return load_credentials()
+
+
+config = copy.deepcopy(get_auth_config(os.path.getmtime(CREDENTIALS_PATH)))  # The authenticator writes into it
 
 # Initialize Authenticator
 authenticator = stauth.Authenticate(
@@ -79,6 +67,13 @@ elif st.session_state["authentication_status"] is None:
     st.stop()
 
 name = st.session_state["name"]
+is_admin = ADMIN_ROLE in user_roles(config, st.session_state.get("username"))
+
+# Every traced stage of this run lands in run_spans; an admin can ask for one profiled rerun
+run_started = time.perf_counter()
+run_spans = collect()
+profile_kind = st.session_state.pop('profile_next_run', None) if is_admin else None
+profiler = start_profile(profile_kind) if profile_kind else None
 
 # ── 3. APP HEADER ──────────────────────────────────────────────────
 st.sidebar.success(f"Welcome, {name}!")
@@ -100,22 +95,48 @@ data_source = st.sidebar.radio(
     key="source"
 )
 
-df = None
-eda_insights = {}
-temp_path = "temp_uploaded_file"
+session = None
+
+
+def load_upload(uploaded_file, upload_digest):
+    # Same bytes as an earlier upload -> reuse the cleaned Parquet copy
+    df = load_cached_dataset(upload_digest)
+    if df is None:
+        # Parsed straight from the upload's buffer: no temp file shared between sessions
+        with st.spinner("🧠 Universal Loader is cleaning your file..."):
+            df = load_data(uploaded_file.getbuffer())
+        save_cached_dataset(upload_digest, df)
+    return df
+
+
+def upload_digest_of(uploaded_file):
+    # Reruns (widget clicks, job polling) keep the same upload: hash its bytes only when file_id changes
+    cached = st.session_state.get('upload_digest')
+    if cached and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    digest = content_hash(uploaded_file.getbuffer())
+    st.session_state['upload_digest'] = (uploaded_file.file_id, digest)
+    return digest
+
 
 # A) FILE UPLOAD
 if data_source == "Upload Excel/CSV":
     uploaded_file = st.sidebar.file_uploader("Upload your messy file", type=['csv', 'xlsx', 'xls'])
     if uploaded_file:
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
         try:
-            with st.spinner("🧠 Universal Loader is cleaning your file..."):
-                df = load_data(temp_path)
-                eda_insights = perform_eda(df)
+            # The content hash is the dataset ID: loading happens once per distinct upload
+            upload_digest = upload_digest_of(uploaded_file)
+            session = open_dataset(st.session_state, f"file:{upload_digest}",
+                                   lambda: load_upload(uploaded_file, upload_digest))
+            df = session.df
             st.sidebar.success("✅ File Loaded & Cleaned!")
+            detection = df.attrs.get('detection', {})
+            if detection.get('format') == 'csv':
+                st.sidebar.caption(f"Read as CSV · {detection['encoding']} · delimiter {detection['delimiter']!r}")
+            elif detection:
+                st.sidebar.caption(f"Read as {detection['format'].upper()}")
+            if 'memory_mb' in df.attrs:
+                st.sidebar.caption(f"In memory: {df.attrs['memory_mb']:.1f} MB")
         except Exception as e:
             st.error(f"Error loading file: {e}")
 
@@ -127,13 +148,66 @@ else:
 
     if st.sidebar.button("Connect to Facebook"):
         with st.spinner("Connecting..."):
-            df = load_fb_ads_data(fb_token, fb_id, days_back=90)
-            if not df.empty:
-                eda_insights = perform_eda(df)
+            fb_df = load_fb_ads_data(fb_token, fb_id, days_back=90)
+            if not fb_df.empty:
+                # Each click is a fresh pull, later reruns keep using it
+                session = open_dataset(st.session_state, f"fb:{fb_id}:{datetime.now().isoformat()}",
+                                       lambda: fb_df)
                 st.success("Data Loaded Successfully!")
+    else:
+        session = current_dataset(st.session_state, prefix="fb:")
+
+df = session.df if session is not None else None
+
+
+def section_requested(session, name, button_label, auto_run=False):
+    """True once the user asked for this section (or auto-run is on); it then stays on for this dataset."""
+    flag = f"show_{name}:{session.dataset_id}"
+    if auto_run or st.session_state.get(flag):
+        return True
+    if st.button(button_label, key=f"btn_{name}"):
+        st.session_state[flag] = True
+        return True
+    return False
+
+
+@st.cache_resource
+def get_job_queue():
+    # One queue per server process: shared by all sessions so identical jobs run once
+    return JobQueue(db_path=JOBS_DB_PATH)
+
+
+def background_artifact(session, name, fn, *params, label="Working"):
+    """
+    Runs fn(progress) as a background job for this dataset and attaches its result to the
+    session when done. Returns the result, or None while the job is still running.
+    """
+    if session.has(name, *params):
+        return session.artifact(name, None, *params)
+
+    job = get_job_queue().submit(name, session.dataset_id, fn, *params)
+    if job.status == DONE:
+        return session.artifact(name, lambda: job.result, *params)
+    if job.status == FAILED:
+        # No polling for a failed job: it only runs again when the user asks
+        st.error(f"❌ {label} failed: {job.error}")
+        if st.button("🔁 Retry", key=f"retry_{name}"):
+            get_job_queue().submit(name, session.dataset_id, fn, *params, retry=True)
+            st.rerun()
+        return None
+
+    done = f"{job.progress}/{job.total}" if job.total else "starting"
+    st.progress(job.fraction, text=f"⏳ {label}... ({done})")
+    st.session_state['jobs_pending'] = True
+    return None
+
 
 # ── 5. MAIN DASHBOARD ──────────────────────────────────────────────
+# Every section reads its result from the dataset session: it is computed on
+# the first rerun that needs it and only again when its own inputs change.
 if df is not None and not df.empty:
+    summary = session.artifact('summary', lambda: build_product_summary(df))
+    eda_insights = session.artifact('eda', lambda: perform_eda(df, summary))
 
     # --- KPIs Row ---
     st.markdown("### 📊 Key Performance Indicators")
@@ -147,98 +221,135 @@ if df is not None and not df.empty:
 
     st.markdown("---")
 
+    # Heavy sections below are laid out as placeholders first and filled
+    # afterwards, so the KPI row shows as soon as the data is loaded.
+    auto_run = st.sidebar.toggle("⚡ Auto-run forecast & packs", value=False, key="auto_run")
+
     # --- ROW 1: Trends & Hierarchy ---
     c1, c2 = st.columns([2, 1])
-    with c1:
-        st.plotly_chart(plot_yoy_trend(df), use_container_width=True)
-    with c2:
-        st.plotly_chart(plot_category_sunburst(df), use_container_width=True)
+    slot_yoy = c1.empty()
+    slot_sunburst = c2.empty()
 
     # --- ROW 2: Strategy & Pareto ---
     c3, c4 = st.columns(2)
-    with c3:
-        st.plotly_chart(plot_pareto_products(df), use_container_width=True)
-    with c4:
-        st.plotly_chart(plot_price_vs_volume(df), use_container_width=True)
+    slot_pareto = c3.empty()
+    slot_price_volume = c4.empty()
+
+    chart_slots = [
+        (slot_yoy, 'chart_yoy', lambda: plot_yoy_trend(df)),
+        (slot_sunburst, 'chart_sunburst', lambda: plot_category_sunburst(df, summary)),
+        (slot_pareto, 'chart_pareto', lambda: plot_pareto_products(df, summary)),
+        (slot_price_volume, 'chart_price_volume', lambda: plot_price_vs_volume(df, summary)),
+    ]
+    for slot, _, _ in chart_slots:
+        slot.info("⏳ Building chart...")
 
     # --- ROW 3: AI Insights ---
     st.markdown("---")
     st.subheader("🤖 AI Business Analyst Insights")
 
     with st.expander("Click to generate AI Analysis", expanded=False):
-        with st.spinner("AI is analyzing your data..."):
-            ai_text = generate_ai_insights(df, eda_insights)
-            for insight in ai_text:
-                st.write(f"• {insight}")
+        ai_slot = st.empty()
 
     # --- ROW 4: Future Predictions (WITH 2:1 LAYOUT) ---
     st.markdown("---")
     st.subheader("🔮 Sales Forecast (Next 30 Days)")
+    forecast_slot = st.container()
 
-    with st.spinner("Predicting future trends..."):
-        top5_df, chart_path = predict_top5_products_next30days(df)
-
-    if top5_df is not None and not top5_df.empty:
-        # HERE IS THE CHANGE: [2, 1] gives table double space
-        col_pred_table, col_pred_chart = st.columns([2, 1])
-
-        with col_pred_table:
-            st.markdown("#### Top 5 Products to Stock Up")
-            st.dataframe(
-                top5_df[['Product', 'Predicted_Units_Next30Days', 'Male_%', 'Female_%', 'Top_Age_Group']]
-                .style.background_gradient(cmap="Greens", subset=['Predicted_Units_Next30Days']),
-                use_container_width=True
-            )
-
-            st.markdown("#### 🏷️ Recommended Price Adjustments")
-            price_recs = recommend_prices(df, top5_df)
-            st.dataframe(price_recs, use_container_width=True)
-
-        with col_pred_chart:
-            if chart_path:
-                st.image(chart_path, use_column_width=True)
-
-        # --- ROW 5: PACK SUGGESTIONS (New Feature) ---
-        st.markdown("---")
-        st.subheader("📦 Smart Pack Suggestions (Bought Together)")
-
-        with st.spinner("Analyzing purchase patterns..."):
-            packs_df = suggest_packs(df)
-
-        if not packs_df.empty:
-            col_pack_text, col_pack_metric = st.columns([2, 1])
-            with col_pack_text:
-                st.info("💡 Strategy: Create these bundles to increase Average Order Value.")
-                display_packs = packs_df[
-                    ['Pack Name', 'Times Bought Together', 'Total Value', 'Suggested Pack Price (10% Off)', 'Savings']]
-                st.dataframe(display_packs.style.background_gradient(cmap="Blues", subset=['Times Bought Together']),
-                             use_container_width=True)
-            with col_pack_metric:
-                best_pack = packs_df.iloc[0]
-                st.metric(label="🔥 Top Opportunity", value=best_pack['Pack Name'],
-                          delta=f"Sold {best_pack['Times Bought Together']} times")
-                st.write(f"**Offer it at:** TND {best_pack['Suggested Pack Price (10% Off)']}")
-        else:
-            st.info("Not enough data to find products bought together (Need Order IDs or multiple items per customer).")
-
-        # --- ROW 6: Actionable Ads ---
-        st.markdown("---")
-        st.subheader("📢 Facebook Ad Targeting Generator")
-        st.info("Copy this JSON code directly into Facebook Ads Manager")
-
-        ad_df = generate_ad_suggestions(top5_df, "dummy_token", "dummy_id")
+    # --- ROW 5: PACK SUGGESTIONS (New Feature) ---
+    st.markdown("---")
+    st.subheader("📦 Smart Pack Suggestions (Bought Together)")
+    packs_slot = st.container()
 
-        if not ad_df.empty:
-            st.json(ad_df.to_dict(orient='records'))
-    else:
-        st.warning("Not enough history to generate predictions (need at least 7 days of data).")
+    # --- ROW 6: Actionable Ads ---
+    st.markdown("---")
+    st.subheader("📢 Facebook Ad Targeting Generator")
+    ads_slot = st.container()
+
+    # ── Fill the placeholders, cheapest first ──
+    for slot, name, build in chart_slots:
+        # Figures are shared across sessions that open the same dataset
+        fig = session.artifact(name, lambda: cached_figure(session.dataset_id, name, build))
+        with trace(f"render.{name}"):  # plotly serialization happens here
+            slot.plotly_chart(fig, use_container_width=True)
+
+    with ai_slot.container():
+        if session.has('ai_insights') or st.button("Generate AI Analysis", key="btn_ai"):
+            with st.spinner("AI is analyzing your data..."):
+                ai_text = session.artifact('ai_insights', lambda: generate_ai_insights(df, eda_insights))
+            for insight in ai_text:
+                st.write(f"• {insight}")
 
-    # Clean up
-    if os.path.exists(temp_path):
-        try:
-            os.remove(temp_path)
-        except:
-            pass
+    top5_df = None
+    with forecast_slot:
+        if section_requested(session, 'forecast', "🔮 Run the 30-day forecast", auto_run):
+            forecast = background_artifact(
+                session, 'forecast',
+                lambda progress: predict_top5_products_next30days(df, summary=summary, _progress=progress),
+                FORECAST_BACKEND, label="Predicting future trends")
+            top5_df, chart_path = forecast or (None, None)
+
+            if top5_df is not None and not top5_df.empty:
+                # HERE IS THE CHANGE: [2, 1] gives table double space
+                col_pred_table, col_pred_chart = st.columns([2, 1])
+
+                with col_pred_table:
+                    st.markdown("#### Top 5 Products to Stock Up")
+                    st.dataframe(
+                        top5_df[['Product', 'Predicted_Units_Next30Days', 'Male_%', 'Female_%', 'Top_Age_Group']]
+                        .style.background_gradient(cmap="Greens", subset=['Predicted_Units_Next30Days']),
+                        use_container_width=True
+                    )
+
+                    st.markdown("#### 🏷️ Recommended Price Adjustments")
+                    price_recs = session.artifact('prices', lambda: recommend_prices(df, top5_df, summary=summary),
+                                                  FORECAST_BACKEND)
+                    st.dataframe(price_recs, use_container_width=True)
+
+                with col_pred_chart:
+                    if chart_path:
+                        st.image(chart_path, use_column_width=True)
+            elif forecast is not None:
+                st.warning("Not enough history to generate predictions (need at least 7 days of data).")
+        else:
+            st.caption("Forecasting fits one model per top product and can take a while.")
+
+    with packs_slot:
+        if section_requested(session, 'packs', "📦 Find product bundles", auto_run):
+            packs_df = background_artifact(
+                session, 'packs', lambda progress: suggest_packs(df, summary=summary, _progress=progress),
+                label="Analyzing purchase patterns")
+
+            if packs_df is not None and not packs_df.empty:
+                col_pack_text, col_pack_metric = st.columns([2, 1])
+                with col_pack_text:
+                    st.info("💡 Strategy: Create these bundles to increase Average Order Value.")
+                    display_packs = packs_df[
+                        ['Pack Name', 'Pack Size', 'Times Bought Together', 'Total Value',
+                         'Suggested Pack Price (10% Off)', 'Savings']]
+                    st.dataframe(display_packs.style.background_gradient(cmap="Blues", subset=['Times Bought Together']),
+                                 use_container_width=True)
+                with col_pack_metric:
+                    best_pack = packs_df.iloc[0]
+                    st.metric(label="🔥 Top Opportunity", value=best_pack['Pack Name'],
+                              delta=f"Sold {best_pack['Times Bought Together']} times")
+                    st.write(f"**Offer it at:** TND {best_pack['Suggested Pack Price (10% Off)']}")
+                if packs_df.attrs.get('note'):
+                    st.caption(f"⚠️ {packs_df.attrs['note']}")
+            elif packs_df is not None:
+                st.info("Not enough data to find products bought together (Need Order IDs or multiple items per customer).")
+
+    with ads_slot:
+        if top5_df is not None and not top5_df.empty:
+            st.info("Copy this JSON code directly into Facebook Ads Manager")
+
+            ad_df = session.artifact('ads', lambda: generate_ad_suggestions(top5_df, "dummy_token", "dummy_id"),
+                                     FORECAST_BACKEND)
+
+            if not ad_df.empty:
+                st.json(ad_df.to_dict(orient='records'))
+        else:
+            st.caption("Ad audiences are built from the forecast's top products. Run the forecast first.")
 
 else:
     st.info("👈 Please upload a file or connect Facebook Ads to begin.")
@@ -249,4 +360,37 @@ else:
     - **AI Predictions:** Forecast next 30 days of sales.
     - **Smart Packs:** Suggests bundles based on purchase history.
     - **Ad Targeting:** Auto-generate audiences.
-    """)
\ No newline at end of file
+    """)
+
+# ── 6. PERFORMANCE PANEL (admins only) ─────────────────────────────
+if is_admin:
+    profile_report = stop_profile(profiler) if profiler else None
+    if profile_report:
+        st.session_state['profile_report'] = profile_report
+
+    with st.sidebar.expander("🛠 Performance"):
+        st.caption(f"This run: {time.perf_counter() - run_started:.2f}s · {len(run_spans)} traced stages")
+        st.dataframe(spans_frame(run_spans), hide_index=True, use_container_width=True)
+
+        job_spans = [s for s in recent_spans(200) if s['thread'].startswith('job')]
+        if job_spans:
+            st.caption("Background jobs (latest)")
+            st.dataframe(spans_frame(job_spans[-20:]), hide_index=True, use_container_width=True)
+
+        kind = st.selectbox("Profiler", ["cprofile", "pyinstrument"], key="profile_kind")
+        if st.button("Profile next rerun"):
+            st.session_state['profile_next_run'] = kind
+            st.rerun()
+        if 'profile_report' in st.session_state:
+            st.code(st.session_state['profile_report'], language=None)
+
+        # Cold-start import report (fresh interpreter, so it shows what a new container pays)
+        if st.button("Profile cold imports"):
+            report = profile_imports()
+            st.caption(f"Imports: {report['total_ms']:.0f} ms · target {STARTUP_TARGET_MS:.0f} ms")
+            st.dataframe(pd.DataFrame(report['modules']), hide_index=True, use_container_width=True)
+
+# Poll running background jobs: cheap rerun once a second until they finish
+if st.session_state.pop('jobs_pending', False):
+    time.sleep(1)
+    st.rerun()
@@ -0,0 +1,59 @@
+# src/auth_store.py
+import os
+import sys
+import getpass
+import tempfile
+import yaml
+from yaml.loader import SafeLoader
+import bcrypt
+
+
+# Pre-hashed accounts live here; bcrypt runs only when a user is added, never per rerun.
+CREDENTIALS_PATH = os.environ.get('AUTH_CONFIG_PATH', 'config.yaml')
+ADMIN_ROLE = 'admin'
+
+
+def load_credentials(path=None):
+    """Reads the authenticator config (credentials + cookie settings) from YAML."""
+    with open(path or CREDENTIALS_PATH, encoding='utf-8') as f:
+        config = yaml.load(f, Loader=SafeLoader) or {}
+    config.setdefault('credentials', {}).setdefault('usernames', {})
+    return config
+
+
+def save_credentials(config, path=None):
+    """Writes the config atomically so a running app never reads half a file."""
+    path = path or CREDENTIALS_PATH
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True)
+    os.replace(tmp_path, path)
+
+
+def add_user(username, name, password, email, path=None, roles=None):
+    """Hashes one new password and stores the account. Existing hashes are left untouched."""
+    config = load_credentials(path)
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    user = {'name': name, 'email': email, 'password': hashed}
+    if roles:
+        user['roles'] = list(roles)
+    config['credentials']['usernames'][username] = user
+    save_credentials(config, path)
+    return config
+
+
+def user_roles(config, username):
+    """Roles listed for an account in the config (`roles: [admin]`), empty if none."""
+    user = config['credentials']['usernames'].get(username) or {}
+    return list(user.get('roles') or [])
+
+
+if __name__ == '__main__':
+    # python -m src.auth_store add <username> "<Full Name>" <email>
+    if len(sys.argv) != 5 or sys.argv[1] != 'add':
+        print('Usage: python -m src.auth_store add <username> "<Full Name>" <email>')
+        sys.exit(1)
+    _, _, username, name, email = sys.argv
+    add_user(username, name, getpass.getpass(f"Password for {username}: "), email)
+    print(f"✅ User '{username}' saved to {CREDENTIALS_PATH}")
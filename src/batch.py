@@ -0,0 +1,163 @@
+# src/batch.py
+"""
+Headless batch mode: runs the full analysis on one or more files without Streamlit.
+
+    python -m src.batch data/client_a.xlsx data/exports/ --out reports/batch --workers 4 --backend fast
+
+Each input gets its own folder under --out with eda.json, forecast, prices,
+packs and ads, plus a batch_report.json summarising the whole run.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import load_data
+from src.eda import perform_eda
+from src.product_summary import build_product_summary
+from src.predictor import predict_top5_products_next30days, recommend_prices
+from src.pack_generator import suggest_packs
+from src.facebook_integraation import suggest_targeting
+
+
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+
+def collect_inputs(paths):
+    """Expands directories into the data files they contain, keeping a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(DATA_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    # The same file listed twice (or inside a listed folder too) is analyzed once
+    unique = {}
+    for path in files:
+        unique.setdefault(os.path.abspath(path), path)
+    return list(unique.values())
+
+
+def output_name(path):
+    """
+    Output folder name for one input: the file name with its extension plus a hash of its
+    absolute path, so a.csv and a.xlsx, or the same name in two folders, never share a folder.
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(path)}-{digest}"
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    return str(value)
+
+
+def _write_json(obj, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=_json_default)
+
+
+def _write_table(df, path_stem, fmt):
+    if fmt == 'parquet':
+        out = df.copy()
+        for col in out.columns:
+            if out[col].dtype == object:
+                out[col] = out[col].astype(str)  # tuples (pack items) are not Parquet types
+        out.to_parquet(f"{path_stem}.parquet", index=False)
+    else:
+        _write_json(df.to_dict(orient='records'), f"{path_stem}.json")
+
+
+def analyze_file(path, out_dir, backend='fast', fmt='json', forecast_workers=1):
+    """
+    load_data -> perform_eda -> forecast -> prices -> packs -> ad audiences for one file.
+    Returns a small status dict for the batch report; errors are reported, not raised.
+    """
+    started = time.perf_counter()
+    target = os.path.join(out_dir, output_name(path))
+    os.makedirs(target, exist_ok=True)
+
+    try:
+        df = load_data(path, sheet_workers=forecast_workers)
+        summary = build_product_summary(df)
+        eda_insights = perform_eda(df, summary)
+        top5_df, chart_path = predict_top5_products_next30days(df, backend=backend, summary=summary,
+                                                               max_workers=forecast_workers)
+        prices = recommend_prices(df, top5_df, summary=summary)
+        packs = suggest_packs(df, summary=summary)
+        ads = suggest_targeting(top5_df) if not top5_df.empty else pd.DataFrame()
+
+        _write_json({'file': path, 'rows': len(df), **eda_insights}, os.path.join(target, 'eda.json'))
+        _write_table(top5_df, os.path.join(target, 'forecast'), fmt)
+        _write_table(prices, os.path.join(target, 'prices'), fmt)
+        _write_table(packs, os.path.join(target, 'packs'), fmt)
+        _write_json(ads.to_dict(orient='records'), os.path.join(target, 'ads.json'))
+        if chart_path:
+            with open(os.path.join(target, 'forecast.png'), 'wb') as f:
+                f.write(base64.b64decode(chart_path.split(',', 1)[1]))
+
+        return {'file': path, 'status': 'ok', 'rows': len(df), 'output': target,
+                'seconds': round(time.perf_counter() - started, 2)}
+    except Exception as e:
+        return {'file': path, 'status': 'failed', 'error': str(e), 'output': target,
+                'seconds': round(time.perf_counter() - started, 2)}
+
+
+def run_batch(paths, out_dir, workers=None, backend='fast', fmt='json'):
+    """Analyzes every input file, several at once on a process pool. Returns the batch report."""
+    files = collect_inputs(paths)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    # Parallelism goes across files; a single file may use the cores for its sheets and forecast instead
+    forecast_workers = 1 if workers > 1 else None
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [analyze_file(f, out_dir, backend, fmt, forecast_workers) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_file, f, out_dir, backend, fmt, forecast_workers) for f in files]
+            results = [future.result() for future in futures]
+
+    report = {
+        'backend': backend,
+        'format': fmt,
+        'workers': workers,
+        'seconds': round(time.perf_counter() - started, 2),
+        'files': results,
+    }
+    _write_json(report, os.path.join(out_dir, 'batch_report.json'))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the sales analysis on files without the dashboard.")
+    parser.add_argument('inputs', nargs='+', help="Data files or directories of .csv/.xlsx/.xls files")
+    parser.add_argument('--out', default=os.path.join('reports', 'batch'), help="Output directory")
+    parser.add_argument('--workers', type=int, default=None, help="Files processed in parallel (default: all cores)")
+    parser.add_argument('--backend', choices=['prophet', 'fast', 'auto'], default='fast', help="Forecast backend")
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json', help="Format of result tables")
+    args = parser.parse_args(argv)
+
+    report = run_batch(args.inputs, args.out, args.workers, args.backend, args.format)
+    failed = [r for r in report['files'] if r['status'] != 'ok']
+    print(f"✅ {len(report['files']) - len(failed)} file(s) analyzed in {report['seconds']}s -> {args.out}")
+    for r in failed:
+        print(f"❌ {r['file']}: {r['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
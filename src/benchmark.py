@@ -0,0 +1,238 @@
+# src/benchmark.py
+"""
+Benchmark suite for the analysis pipeline on synthetic data.
+
+    python -m src.benchmark --rows 10k 100k 1M --products 500 --french
+    python -m src.benchmark --rows 100k --compare reports/benchmarks/<old>.json
+
+For each size a messy export is generated and written to disk, then load_data,
+the product summary, perform_eda, every plot builder, the forecaster,
+recommend_prices and suggest_packs are timed (best of --repeat) and run once
+more under tracemalloc for their peak memory. Every run starts with empty
+forecast and layout caches, so no repeat is a cache hit. Results go to a JSON
+file that --compare can diff against a run from another commit.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from src import forecast_cache, layout_cache
+from src.synthetic import generate_sales, write_dataset
+from src.data_loader import load_data
+from src.product_summary import build_product_summary
+from src.eda import perform_eda, plot_yoy_trend, plot_pareto_products, plot_category_sunburst, plot_price_vs_volume
+from src.predictor import predict_top5_products_next30days, recommend_prices
+from src.pack_generator import suggest_packs
+
+
+# --- BENCHMARK SETTINGS ---
+BENCHMARK_DIR = os.environ.get('BENCHMARK_DIR', os.path.join('reports', 'benchmarks'))
+DEFAULT_SIZES = ['10k', '100k', '1M']
+REGRESSION_RATIO = 1.2  # --compare flags stages that got this much slower
+
+# Each stage reads what it needs from the context and may store its result for later stages
+STAGES = [
+    ('load_data', lambda ctx: ctx.update(df=load_data(ctx['path']))),
+    ('product_summary', lambda ctx: ctx.update(summary=build_product_summary(ctx['df']))),
+    ('perform_eda', lambda ctx: perform_eda(ctx['df'], ctx['summary'])),
+    ('plot_yoy_trend', lambda ctx: plot_yoy_trend(ctx['df'])),
+    ('plot_pareto_products', lambda ctx: plot_pareto_products(ctx['df'], ctx['summary'])),
+    ('plot_category_sunburst', lambda ctx: plot_category_sunburst(ctx['df'], ctx['summary'])),
+    ('plot_price_vs_volume', lambda ctx: plot_price_vs_volume(ctx['df'], ctx['summary'])),
+    ('forecast', lambda ctx: ctx.update(top5=predict_top5_products_next30days(
+        ctx['df'], backend=ctx['backend'], summary=ctx['summary'])[0])),
+    ('recommend_prices', lambda ctx: recommend_prices(ctx['df'], ctx['top5'], summary=ctx['summary'])),
+    ('suggest_packs', lambda ctx: suggest_packs(ctx['df'], summary=ctx['summary'])),
+]
+
+
+def parse_size(text):
+    """'10k' -> 10000, '2.5M' -> 2500000."""
+    text = str(text).strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def fresh_caches():
+    """Points the forecast and layout caches at a new empty directory for one run."""
+    saved = forecast_cache.CACHE_DIR, layout_cache.LAYOUT_CACHE_DIR
+    with tempfile.TemporaryDirectory(prefix='bench_cache_') as cache_dir:
+        forecast_cache.CACHE_DIR = os.path.join(cache_dir, 'forecasts')
+        layout_cache.LAYOUT_CACHE_DIR = os.path.join(cache_dir, 'layouts')
+        layout_cache.clear_layouts()  # Also drops the in-process copies
+        try:
+            yield
+        finally:
+            forecast_cache.CACHE_DIR, layout_cache.LAYOUT_CACHE_DIR = saved
+            layout_cache.clear_layouts(cache_dir=os.path.join(cache_dir, 'layouts'))
+
+
+def measure(fn, ctx, repeat=1, memory=True):
+    """Best wall time over `repeat` runs, plus the tracemalloc peak of one extra run, each with cold caches."""
+    times = []
+    for _ in range(repeat):
+        with fresh_caches():
+            started = time.perf_counter()
+            fn(ctx)
+            times.append(time.perf_counter() - started)
+
+    peak_mb = None
+    if memory:
+        with fresh_caches():
+            tracemalloc.start()
+            try:
+                fn(ctx)
+                peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            finally:
+                tracemalloc.stop()
+    return min(times), peak_mb
+
+
+def run_size(n_rows, workdir, args):
+    """Generates one dataset and times every stage on it."""
+    started = time.perf_counter()
+    df = generate_sales(n_rows, n_products=args.products, n_categories=args.categories, days=args.days,
+                        basket_size=args.basket_size, seed=args.seed)
+    generate_seconds = time.perf_counter() - started
+
+    path = os.path.join(workdir, f"sales_{n_rows}.{args.format}")
+    started = time.perf_counter()
+    write_dataset(df, path, french=args.french, messy=not args.clean, seed=args.seed)
+    write_seconds = time.perf_counter() - started
+    del df
+
+    ctx = {'path': path, 'backend': args.backend}
+    results = []
+    for stage, fn in STAGES:
+        seconds, peak_mb = measure(fn, ctx, repeat=args.repeat, memory=not args.no_memory)
+        results.append({'rows': n_rows, 'stage': stage, 'seconds': round(seconds, 4),
+                        'peak_mb': None if peak_mb is None else round(peak_mb, 1)})
+        print(f"{n_rows:>10,} {stage:<24} {seconds:>9.3f}s" + (f" {peak_mb:>9.1f} MB" if peak_mb else ''))
+
+    dataset = {'rows': n_rows, 'rows_loaded': len(ctx['df']), 'generate_seconds': round(generate_seconds, 3),
+               'write_seconds': round(write_seconds, 3), 'file_mb': round(os.path.getsize(path) / 1e6, 1)}
+    print(f"{n_rows:>10,} rows loaded: {dataset['rows_loaded']:,} · generate {generate_seconds:.2f}s · "
+          f"write {write_seconds:.2f}s · file {dataset['file_mb']} MB")
+    os.remove(path)
+    return results, dataset
+
+
+def warm_up(workdir, args, n_rows=2000):
+    """Runs every stage once on a small file so lazy imports and first-call setup are not timed."""
+    path = os.path.join(workdir, f"warmup.{args.format}")
+    write_dataset(generate_sales(n_rows, n_products=min(args.products, 50), seed=args.seed), path,
+                  french=args.french, messy=not args.clean, seed=args.seed)
+    ctx = {'path': path, 'backend': args.backend}
+    for _, fn in STAGES:
+        fn(ctx)
+    os.remove(path)
+
+
+def run_benchmark(args):
+    """Runs every requested size and returns the report dict."""
+    sizes = [parse_size(s) for s in args.rows]
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare', 'ratio')},
+        'datasets': [],
+        'results': [],
+    }
+
+    # Nothing is read from (or left in) the real caches, warm-up included
+    with tempfile.TemporaryDirectory(prefix='bench_') as workdir, fresh_caches():
+        warm_up(workdir, args)
+        for n_rows in sizes:
+            results, dataset = run_size(n_rows, workdir, args)
+            report['results'].extend(results)
+            report['datasets'].append(dataset)
+
+    report['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+    return report
+
+
+def compare_reports(old, new, ratio=REGRESSION_RATIO):
+    """Stages (per row count) whose time grew by more than `ratio`, as (rows, stage, old_s, new_s)."""
+    before = {(r['rows'], r['stage']): r['seconds'] for r in old['results']}
+    slower = []
+    for r in new['results']:
+        old_seconds = before.get((r['rows'], r['stage']))
+        # Stages under 50 ms are too noisy to flag
+        if old_seconds and max(old_seconds, r['seconds']) >= 0.05 and r['seconds'] > old_seconds * ratio:
+            slower.append((r['rows'], r['stage'], old_seconds, r['seconds']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic data.")
+    parser.add_argument('--rows', nargs='+', default=DEFAULT_SIZES, help="Dataset sizes, e.g. 10k 1M 10M")
+    parser.add_argument('--products', type=int, default=200, help="Number of distinct products")
+    parser.add_argument('--categories', type=int, default=12, help="Number of categories")
+    parser.add_argument('--days', type=int, default=365, help="Days of history")
+    parser.add_argument('--basket-size', type=float, default=2.5, help="Average items per basket")
+    parser.add_argument('--french', action='store_true', help="French headers and ';' separated CSV")
+    parser.add_argument('--clean', action='store_true', help="Plain numbers and ISO dates instead of messy strings")
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help="File format fed to load_data")
+    parser.add_argument('--backend', choices=['prophet', 'fast', 'auto'], default='fast', help="Forecast backend")
+    parser.add_argument('--repeat', type=int, default=1, help="Timed runs per stage (best is kept)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help="Result file (default: reports/benchmarks/<commit>-<time>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier result file to check for regressions")
+    parser.add_argument('--ratio', type=float, default=REGRESSION_RATIO, help="Slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+
+    out = args.out or os.path.join(
+        BENCHMARK_DIR, f"{report['commit'] or 'nogit'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out} (peak RSS {report['peak_rss_mb']} MB)")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            slower = compare_reports(json.load(f), report, args.ratio)
+        for rows, stage, old_seconds, new_seconds in slower:
+            print(f"❌ {stage} at {rows:,} rows: {old_seconds:.3f}s -> {new_seconds:.3f}s")
+        if slower:
+            return 1
+        print(f"✅ No stage over {args.ratio}x slower than {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# src/dataset_store.py
+import os
+import time
+import hashlib
+import tempfile
+import pandas as pd
+from src.data_loader import compact_frame
+from src.tracing import traced
+
+try:
+    import pyarrow  # noqa: F401  (Parquet engine)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+
+# --- STORE SETTINGS ---
+# Cleaned uploads, one Parquet file per content hash. Bump STORE_VERSION when
+# the loader's output changes so old entries are never served.
+STORE_DIR = os.environ.get('DATASET_STORE_DIR', os.path.join('.cache', 'datasets'))
+STORE_MAX_BYTES = int(os.environ.get('DATASET_STORE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+STORE_MAX_AGE_DAYS = float(os.environ.get('DATASET_STORE_MAX_AGE_DAYS', 30))
+STORE_VERSION = 4
+
+
+def content_hash(data):
+    """SHA-256 of the uploaded bytes (bytes, memoryview or a file path)."""
+    h = hashlib.sha256(f"v{STORE_VERSION}:".encode('utf-8'))
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        h.update(data)
+    else:
+        with open(data, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+    return h.hexdigest()
+
+
+def _entry_path(digest, store_dir):
+    return os.path.join(store_dir, f"{digest}.parquet")
+
+
+@traced()
+def load_cached_dataset(digest, store_dir=None):
+    """Returns the cleaned frame stored for this upload, or None on a miss."""
+    if not HAS_PARQUET:
+        return None
+    path = _entry_path(digest, store_dir or STORE_DIR)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path, engine='pyarrow', memory_map=True)
+        os.utime(path)  # Mark as recently used
+        return df
+    except Exception:
+        return None
+
+
+@traced()
+def save_cached_dataset(digest, df, store_dir=None):
+    """Stores a cleaned frame as Parquet with categorical text columns, then trims the store."""
+    if not HAS_PARQUET:
+        return
+    store_dir = store_dir or STORE_DIR
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        compact = compact_frame(df)
+
+        fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix='.tmp')
+        os.close(fd)
+        compact.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, _entry_path(digest, store_dir))
+    except Exception:
+        return
+    evict_datasets(store_dir)
+
+
+def evict_datasets(store_dir=None, max_bytes=None, max_age_days=None):
+    """Drops entries older than max_age_days, then least recently used ones until under max_bytes."""
+    store_dir = store_dir or STORE_DIR
+    max_bytes = STORE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = STORE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+
+    try:
+        entries = []
+        with os.scandir(store_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.parquet'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    entries.sort()
+    cutoff = time.time() - max_age_days * 86400
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
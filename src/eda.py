@@ -1,36 +1,115 @@
 # src/eda.py
+import os
+import threading
+from collections import OrderedDict
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+from src.product_summary import build_product_summary
+from src.tracing import traced
 
 
-def perform_eda(df: pd.DataFrame) -> dict:
+# --- CHART DATA LIMITS ---
+# What reaches the browser stays bounded however many SKUs the dataset has:
+# small items are bucketed into "Other" and big scatters switch to WebGL.
+SUNBURST_MAX_CATEGORIES = int(os.environ.get('SUNBURST_MAX_CATEGORIES', 15))
+SUNBURST_MAX_PRODUCTS = int(os.environ.get('SUNBURST_MAX_PRODUCTS', 10))  # per category
+SCATTER_MAX_POINTS = int(os.environ.get('SCATTER_MAX_POINTS', 2000))
+WEBGL_MIN_POINTS = 1000
+FIGURE_CACHE_SIZE = 64
+OTHER_LABEL = 'Other'
+
+MONTH_ORDER = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+
+
+@traced()
+def perform_eda(df: pd.DataFrame, summary: pd.DataFrame = None) -> dict:
     """Calculates basic KPIs for the dashboard."""
+    if summary is None:
+        summary = build_product_summary(df)
+
     insights = {}
     insights['total_revenue'] = df['Revenue'].sum()
     insights['total_orders'] = len(df)
 
-    top_prod = df.groupby('Product')['Revenue'].sum().nlargest(1)
+    top_prod = summary['Revenue'].nlargest(1)
     insights['most_profitable_product'] = top_prod.index[0] if not top_prod.empty else "Unknown"
 
-    top_cat = df.groupby('Category')['Revenue'].sum().nlargest(1)
+    top_cat = df.groupby('Category', observed=True)['Revenue'].sum().nlargest(1)
     insights['top_category'] = top_cat.index[0] if not top_cat.empty else "Unknown"
 
     return insights
 
 
+# --- CHART DATA LAYER ---
+def top_n_with_other(values, n, other_label=OTHER_LABEL):
+    """Keeps the n largest entries of a Series and sums the rest into one `other_label` entry."""
+    values = values.sort_values(ascending=False)
+    if len(values) <= n:
+        return values
+    top = values.iloc[:n]
+    return pd.concat([top, pd.Series({other_label: values.iloc[n:].sum()})])
+
+
+def sunburst_frame(summary, max_categories=SUNBURST_MAX_CATEGORIES, max_products=SUNBURST_MAX_PRODUCTS):
+    """
+    Category -> Product revenue with at most max_categories categories (plus "Other")
+    and max_products products per category (plus "Other <category>").
+    """
+    agg = summary[['Category', 'Revenue']].reset_index()
+    agg['Category'] = agg['Category'].astype(str)
+    agg['Product'] = agg['Product'].astype(str)
+
+    top_categories = top_n_with_other(agg.groupby('Category')['Revenue'].sum(), max_categories).index
+    agg.loc[~agg['Category'].isin(top_categories), 'Category'] = OTHER_LABEL
+
+    # Rank products inside their category; everything past max_products becomes one leaf
+    agg = agg.sort_values('Revenue', ascending=False, kind='mergesort')
+    rank = agg.groupby('Category').cumcount()
+    agg.loc[rank >= max_products, 'Product'] = OTHER_LABEL + ' ' + agg['Category']
+    return agg.groupby(['Category', 'Product'], sort=False, as_index=False)['Revenue'].sum()
+
+
+def limit_points(frame, by, max_points=SCATTER_MAX_POINTS):
+    """The max_points rows with the largest `by` (the ones a reader looks at), in their original order."""
+    if len(frame) <= max_points:
+        return frame
+    return frame.loc[frame[by].nlargest(max_points).index.sort_values()]
+
+
+_figure_cache = OrderedDict()
+_figure_lock = threading.Lock()
+
+
+def cached_figure(dataset_id, name, build, *params):
+    """
+    Figure `name` for a dataset, built once per (dataset_id, name, params) and shared by
+    every session that opens the same data. Least recently used figures are dropped first.
+    """
+    key = (dataset_id, name) + params
+    with _figure_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+    fig = build()
+    with _figure_lock:
+        _figure_cache[key] = fig
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+
 # --- 1. YEAR-OVER-YEAR TREND (The "Are we growing?" Chart) ---
+@traced()
 def plot_yoy_trend(df):
-    df['Year'] = df['Date'].dt.year
-    df['Month'] = df['Date'].dt.month_name()
-    # Sort months correctly
-    month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                   'July', 'August', 'September', 'October', 'November', 'December']
-
-    monthly = df.groupby(['Year', 'Month'])['Revenue'].sum().reset_index()
+    import plotly.express as px  # Deferred: perform_eda alone (batch mode) never loads plotly
+    # Group on derived keys instead of adding Year/Month columns to the caller's frame
+    dates = df['Date']
+    monthly = df['Revenue'].groupby([dates.dt.year.rename('Year'), dates.dt.month.rename('Month')]).sum()
+    monthly = monthly.reset_index()
+    monthly['Month'] = [MONTH_ORDER[m - 1] for m in monthly['Month']]
 
     fig = px.line(monthly, x='Month', y='Revenue', color='Year', markers=True,
-                  category_orders={'Month': month_order},
+                  category_orders={'Month': MONTH_ORDER},
                   title="📈 Year-Over-Year Performance Comparison",
                   color_discrete_sequence=px.colors.qualitative.Prism)
     fig.update_layout(xaxis_title="", yaxis_title="Revenue", hovermode="x unified")
@@ -38,9 +117,14 @@ def plot_yoy_trend(df):
 
 
 # --- 2. PARETO CHART (The "What matters?" Chart) ---
-def plot_pareto_products(df):
-    # Group by product and sort
-    data = df.groupby('Product')['Revenue'].sum().sort_values(ascending=False).reset_index()
+@traced()
+def plot_pareto_products(df, summary=None):
+    import plotly.graph_objects as go
+    if summary is None:
+        summary = build_product_summary(df)
+
+    # Sort the per-product totals
+    data = summary['Revenue'].sort_values(ascending=False).reset_index()
     data['Cumulative %'] = 100 * data['Revenue'].cumsum() / data['Revenue'].sum()
 
     # Take top 20 products to keep it readable
@@ -68,10 +152,15 @@ def plot_pareto_products(df):
 
 
 # --- 3. SUNBURST CHART (The "Drill Down" Chart) ---
-def plot_category_sunburst(df):
+@traced()
+def plot_category_sunburst(df, summary=None):
+    import plotly.express as px
+    if summary is None:
+        summary = build_product_summary(df)
+
     # Hierarchical view: Category -> Product
-    # We aggregate first to handle large data
-    agg = df.groupby(['Category', 'Product'])['Revenue'].sum().reset_index()
+    # Products sit under their main category, small ones bucketed so the node count stays bounded
+    agg = sunburst_frame(summary)
 
     fig = px.sunburst(agg, path=['Category', 'Product'], values='Revenue',
                       title="🎯 Revenue by Category (Click to Zoom)",
@@ -80,17 +169,22 @@ def plot_category_sunburst(df):
 
 
 # --- 4. SCATTER MATRIX (The "Strategy" Chart) ---
-def plot_price_vs_volume(df):
-    # Group by Product
-    prod = df.groupby('Product').agg({
-        'Revenue': 'sum',
-        'Quantity': 'sum',
-        'Price': 'mean',
-        'Category': 'first'
-    }).reset_index()
+@traced()
+def plot_price_vs_volume(df, summary=None):
+    import plotly.express as px
+    if summary is None:
+        summary = build_product_summary(df)
+
+    prod = summary[['Revenue', 'Quantity', 'Price', 'Category']].reset_index()
+    total = len(prod)
+    prod = limit_points(prod, 'Revenue')
+
+    title = "💎 Price vs. Volume Strategy Matrix"
+    if len(prod) < total:
+        title += f" (top {len(prod):,} of {total:,} products by revenue)"
 
     fig = px.scatter(prod, x='Price', y='Quantity', size='Revenue', color='Category',
-                     hover_name='Product', log_x=True,
-                     title="💎 Price vs. Volume Strategy Matrix",
+                     hover_name='Product', log_x=True, title=title,
+                     render_mode='webgl' if len(prod) >= WEBGL_MIN_POINTS else 'svg',
                      labels={'Price': 'Avg Price (Log Scale)', 'Quantity': 'Total Units Sold'})
     return fig
\ No newline at end of file
@@ -1,19 +1,43 @@
 # src/facebook_integration.py
 import pandas as pd
-from facebook_business.api import FacebookAdsApi
-from facebook_business.adobjects.targeting import Targeting
+from src.tracing import traced
 
+
+def build_targeting(row):
+    """Targeting spec for one forecast row, same keys as facebook_business Targeting.export_all_data()."""
+    return {
+        'genders': [1 if row['Male_%'] > row['Female_%'] else 2],  # 1=Male, 2=Female
+        'age_min': int(row['Top_Age_Group'].split('-')[0]) if '-' in row['Top_Age_Group'] else 18,
+        'age_max': int(row['Top_Age_Group'].split('-')[1]) if '-' in row['Top_Age_Group'] else 65,
+        'regions': [{'key': 'TN'}],  # Tunisia
+    }
+
+
+@traced()
+def suggest_targeting(top5_df):
+    """Ad audiences for the forecast's top products, without touching the Facebook SDK."""
+    suggestions = []
+    for _, row in top5_df.iterrows():
+        suggestions.append({
+            'Product': row['Product'],
+            'Suggested_Targeting': build_targeting(row)
+        })
+    return pd.DataFrame(suggestions)
+
+
+@traced()
 def generate_ad_suggestions(top5_df, access_token, ad_account_id):
+    from facebook_business.api import FacebookAdsApi
+    from facebook_business.adobjects.targeting import Targeting
+
     FacebookAdsApi.init(access_token=access_token)
     suggestions = []
     for _, row in top5_df.iterrows():
         targeting = Targeting()
-        targeting[Targeting.Field.genders] = [1 if row['Male_%'] > row['Female_%'] else 2]  # 1=Male, 2=Female
-        targeting[Targeting.Field.age_min] = int(row['Top_Age_Group'].split('-')[0]) if '-' in row['Top_Age_Group'] else 18
-        targeting[Targeting.Field.age_max] = int(row['Top_Age_Group'].split('-')[1]) if '-' in row['Top_Age_Group'] else 65
-        targeting[Targeting.Field.regions] = [{'key': 'TN'}]  # Tunisia
+        for field, value in build_targeting(row).items():
+            targeting[field] = value
         suggestions.append({
             'Product': row['Product'],
             'Suggested_Targeting': targeting.export_all_data()
         })
-    return pd.DataFrame(suggestions)
\ No newline at end of file
+    return pd.DataFrame(suggestions)
@@ -0,0 +1,85 @@
+# src/forecast_cache.py
+import os
+import pickle
+import hashlib
+import tempfile
+import pandas as pd
+
+
+# --- CACHE SETTINGS ---
+# One small pickle per product forecast; least recently used entries are dropped first.
+CACHE_DIR = os.environ.get('FORECAST_CACHE_DIR', os.path.join('.cache', 'forecasts'))
+CACHE_MAX_BYTES = int(os.environ.get('FORECAST_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+CACHE_MAX_ENTRIES = int(os.environ.get('FORECAST_CACHE_MAX_ENTRIES', 20000))
+
+
+def series_fingerprint(prophet_df, settings):
+    """
+    Hashes one product's daily series together with the model settings.
+    Any change in history or settings produces a new key.
+    """
+    h = hashlib.sha256()
+    h.update(repr(sorted(settings.items())).encode('utf-8'))
+    series = prophet_df[['ds', 'y']].sort_values('ds')
+    h.update(pd.util.hash_pandas_object(series, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+
+def load_forecast(key, cache_dir=None):
+    """Returns the cached forecast for this key, or None on a miss."""
+    path = _entry_path(key, cache_dir or CACHE_DIR)
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.utime(path)  # Mark as recently used
+        return value
+    except Exception:
+        return None
+
+
+def save_forecast(key, value, cache_dir=None):
+    """Writes one forecast atomically so concurrent sessions never read half a file."""
+    cache_dir = cache_dir or CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, _entry_path(key, cache_dir))
+    except Exception:
+        pass
+
+
+def evict_forecasts(cache_dir=None, max_bytes=None, max_entries=None):
+    """Drops least recently used entries until the cache fits its size limits."""
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+
+    try:
+        entries = []
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes and len(entries) - removed <= max_entries:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,141 @@
+# src/jobs.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+# --- JOB SETTINGS ---
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join('.cache', 'jobs.sqlite'))
+MAX_FINISHED_JOBS = 200
+
+QUEUED, RUNNING, DONE, FAILED, INTERRUPTED = 'queued', 'running', 'done', 'failed', 'interrupted'
+
+
+def job_key(kind, dataset_id, params):
+    """Identical work (same kind, dataset and parameters) always gets the same job ID."""
+    return hashlib.sha1(repr((kind, dataset_id, params)).encode('utf-8')).hexdigest()
+
+
+class Job:
+    """One unit of background work and its progress. The result stays in memory only."""
+
+    def __init__(self, job_id, kind, dataset_id):
+        self.job_id = job_id
+        self.kind = kind
+        self.dataset_id = dataset_id
+        self.status = QUEUED
+        self.progress = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def fraction(self):
+        if self.status == DONE:
+            return 1.0
+        return min(self.progress / self.total, 1.0) if self.total else 0.0
+
+
+class JobQueue:
+    """
+    In-process executor plus a job table, mirrored to SQLite when db_path is set.
+    Jobs are submitted per dataset, report progress through a callback, and
+    identical submissions (e.g. two users on the same upload) share one job.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, db_path=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        if db_path:
+            self._init_db()
+
+    # --- Public API ---
+    def submit(self, kind, dataset_id, fn, *params, retry=False):
+        """
+        Queues fn(progress) unless the same job is already known (queued, running, done or
+        failed). progress(done, total) may be called by fn at any time. A failed job is
+        returned as is, so callers can show its error; retry=True queues it again.
+        """
+        job_id = job_key(kind, dataset_id, params)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not (retry and job.status == FAILED):
+                return job
+            job = Job(job_id, kind, dataset_id)
+            self._jobs[job_id] = job
+            self._trim()
+        self._save(job)
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    # --- Worker side ---
+    def _run(self, job, fn):
+        job.status = RUNNING
+        self._save(job)
+
+        def progress(done, total):
+            job.progress, job.total = int(done), int(total)
+            self._save(job)
+
+        try:
+            job.result = fn(progress)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        self._save(job)
+
+    def _trim(self):
+        # Keep the table bounded: drop the oldest finished jobs (caller holds the lock)
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.updated_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.job_id]
+
+    # --- SQLite mirror ---
+    @contextmanager
+    def _connect(self):
+        # Progress ticks save often: commit and close each connection instead of leaving it to the GC
+        conn = sqlite3.connect(self._db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self._db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY, kind TEXT, dataset_id TEXT, status TEXT,
+                    progress INTEGER, total INTEGER, error TEXT, created_at REAL, updated_at REAL
+                )""")
+            # Jobs left running by a previous process will never finish
+            conn.execute("UPDATE jobs SET status = ? WHERE status IN (?, ?)", (INTERRUPTED, QUEUED, RUNNING))
+
+    def _save(self, job):
+        job.updated_at = time.time()
+        if not self._db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.job_id, job.kind, str(job.dataset_id), job.status, job.progress, job.total,
+                     job.error, job.created_at, job.updated_at)
+                )
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,81 @@
+# src/layout_cache.py
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+
+# --- CACHE SETTINGS ---
+# One small JSON profile per known header layout (header cells + keyword index version).
+# A recurring export from the same client system is recognized by its header row and
+# reuses the stored column mapping instead of running header detection again.
+LAYOUT_CACHE_DIR = os.environ.get('LAYOUT_CACHE_DIR', os.path.join('.cache', 'layouts'))
+LAYOUT_CACHE = os.environ.get('LAYOUT_CACHE', '1') not in ('0', 'false', 'False', '')
+
+_memory = {}
+_memory_lock = threading.Lock()
+
+
+def header_fingerprint(cells, version=''):
+    """Hashes the exact header cells (order included) together with the keyword index version."""
+    h = hashlib.sha256(version.encode('utf-8'))
+    for cell in cells:
+        h.update(b'\x1f' + str(cell).encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_layout(key, cache_dir=None):
+    """Returns the stored layout profile for this fingerprint, or None on a miss."""
+    if not LAYOUT_CACHE:
+        return None
+    with _memory_lock:
+        profile = _memory.get(key)
+    if profile is not None:
+        return dict(profile)
+    try:
+        with open(_entry_path(key, cache_dir or LAYOUT_CACHE_DIR), encoding='utf-8') as f:
+            profile = json.load(f)
+    except Exception:
+        return None
+    with _memory_lock:
+        _memory[key] = profile
+    return dict(profile)
+
+
+def save_layout(key, profile, cache_dir=None):
+    """Writes one profile atomically so concurrent sessions never read half a file."""
+    if not LAYOUT_CACHE:
+        return
+    cache_dir = cache_dir or LAYOUT_CACHE_DIR
+    with _memory_lock:
+        _memory[key] = dict(profile)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False)
+        os.replace(tmp_path, _entry_path(key, cache_dir))
+    except Exception:
+        pass
+
+
+def clear_layouts(cache_dir=None):
+    """Forgets every stored layout (e.g. after the keyword lists were edited by hand)."""
+    cache_dir = cache_dir or LAYOUT_CACHE_DIR
+    with _memory_lock:
+        _memory.clear()
+    removed = 0
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    os.remove(entry.path)
+                    removed += 1
+    except FileNotFoundError:
+        pass
+    return removed
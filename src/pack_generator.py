@@ -1,8 +1,14 @@
 # src/pack_generator.py
 import pandas as pd
-from itertools import combinations
-from collections import Counter
-import streamlit as st
+import numpy as np
+from src.st_compat import cache_data
+from src.product_summary import build_product_summary
+from src.tracing import traced
+
+
+# --- PACK MINING SETTINGS ---
+MAX_PACK_SIZE = 3
+MINING_BUDGET_MB = 256
 
 
 def get_basket_id(df):
@@ -30,53 +36,236 @@ def get_basket_id(df):
     return proxy_cols
 
 
-@st.cache_data(show_spinner=False)
-def suggest_packs(df, min_transactions=5):
+@traced()
+def basket_incidence(df, basket_cols):
+    """
+    Encodes baskets as a sparse basket x product 0/1 matrix.
+    Returns (matrix, products); product codes follow sorted product names.
+    """
+    from scipy import sparse  # Deferred until baskets are actually mined
+    # Rows with a missing basket key get NaN from ngroup(); mark them -1 like unknown products
+    basket_codes = df.groupby(basket_cols, observed=True, sort=False).ngroup()
+    basket_codes = basket_codes.fillna(-1).to_numpy(dtype=np.int64)
+    product_codes, products = pd.factorize(df['Product'], sort=True)
+
+    valid = (basket_codes >= 0) & (product_codes >= 0)
+    n_baskets = int(basket_codes.max()) + 1 if valid.any() else 0
+    matrix = sparse.csr_matrix(
+        (np.ones(valid.sum(), dtype=np.int32), (basket_codes[valid], product_codes[valid])),
+        shape=(n_baskets, len(products))
+    )
+    # Duplicate lines of the same product in one basket count once
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, pd.Index(products)
+
+
+@traced(rows=lambda args, kwargs: args[0].shape[0])
+def pair_statistics(matrix, products, min_count=1):
+    """
+    Counts every product pair with one sparse product (X^T X) and derives
+    support, confidence and lift. Rows are sorted by count, then name.
+    """
+    from scipy import sparse
+    columns = ['Item A', 'Item B', 'Count', 'Support', 'Confidence (A→B)', 'Confidence (B→A)', 'Lift']
+    n_baskets = matrix.shape[0]
+    if n_baskets == 0:
+        return pd.DataFrame(columns=columns)
+
+    item_counts = np.asarray(matrix.sum(axis=0)).ravel()
+    co = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    keep = co.data >= min_count
+    a, b, count = co.row[keep], co.col[keep], co.data[keep].astype(np.int64)
+
+    support = count / n_baskets
+    support_a = item_counts[a] / n_baskets
+    support_b = item_counts[b] / n_baskets
+
+    pairs = pd.DataFrame({
+        'Item A': products[a],
+        'Item B': products[b],
+        'Count': count,
+        'Support': support,
+        'Confidence (A→B)': count / item_counts[a],
+        'Confidence (B→A)': count / item_counts[b],
+        'Lift': support / (support_a * support_b),
+    }, columns=columns)
+    return pairs.sort_values(['Count', 'Item A', 'Item B'], ascending=[False, True, True],
+                             kind='mergesort').reset_index(drop=True)
+
+
+@traced(rows=lambda args, kwargs: args[0].shape[0])
+def frequent_itemsets(matrix, products, min_count, max_size=MAX_PACK_SIZE, memory_budget_mb=MINING_BUDGET_MB):
+    """
+    Apriori-style mining of itemsets with 3 to max_size products.
+    A k-itemset is only counted if all its (k-1)-subsets are frequent, and each
+    level only looks at baskets holding at least k products. Mining stops
+    early (keeping what was found) if a level would exceed the memory budget.
+    Returns a DataFrame with 'Items' (tuple of names), 'Size', 'Count', 'Support', 'Lift';
+    after an early stop, attrs['stopped'] says why.
+    """
+    from scipy import sparse
+    columns = ['Items', 'Size', 'Count', 'Support', 'Lift']
+    n_baskets = matrix.shape[0]
+    if n_baskets == 0 or max_size < 3:
+        return pd.DataFrame(columns=columns)
+
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    names = np.asarray(products, dtype=object)
+    matrix = matrix.tocsc()
+    item_counts = np.asarray(matrix.sum(axis=0)).ravel()
+    basket_sizes = np.asarray(matrix.sum(axis=1)).ravel()
+
+    # Level 2 seeds the search
+    co = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    keep = co.data >= min_count
+    frequent = set(zip(co.row[keep].tolist(), co.col[keep].tolist()))
+
+    found = []
+    stopped = None
+    for size in range(3, max_size + 1):
+        # Join (k-1)-itemsets sharing their first k-2 items
+        by_prefix = {}
+        for items in sorted(frequent):
+            by_prefix.setdefault(items[:-1], []).append(items[-1])
+
+        n_candidates = sum(len(v) * (len(v) - 1) // 2 for v in by_prefix.values())
+        if n_candidates == 0:
+            break
+        level_matrix = matrix[basket_sizes >= size]
+        estimate = n_candidates * (size * 8 + 100) + level_matrix.shape[0] * 8 + level_matrix.data.nbytes
+        if estimate > budget_bytes:
+            stopped = (f"Packs of {size}+ products were skipped: ~{estimate / 1e6:.0f} MB needed, "
+                       f"budget is {memory_budget_mb} MB")
+            break
+
+        level = {}
+        for prefix, lasts in by_prefix.items():
+            if len(lasts) < 2:
+                continue
+            prefix_cols = list(prefix)
+            prefix_mask = np.asarray(level_matrix[:, prefix_cols].sum(axis=1)).ravel() == len(prefix_cols)
+            if prefix_mask.sum() < min_count:
+                continue
+
+            for i, a in enumerate(lasts[:-1]):
+                # Prune: every subset dropping one prefix item must be frequent too
+                exts = [b for b in lasts[i + 1:]
+                        if all(prefix[:j] + prefix[j + 1:] + (a, b) in frequent for j in range(len(prefix)))]
+                if not exts:
+                    continue
+                mask_a = prefix_mask & (level_matrix[:, a].toarray().ravel() > 0)
+                if mask_a.sum() < min_count:
+                    continue
+                counts = level_matrix[:, exts].T @ mask_a.astype(np.int32)
+                for b, count in zip(exts, np.asarray(counts).ravel()):
+                    if count >= min_count:
+                        level[prefix + (a, b)] = int(count)
+
+        if not level:
+            break
+        # Score the whole level at once; names come from a plain object array, since
+        # indexing the (categorical) product Index once per itemset dominates at scale
+        level_items = np.array(list(level.keys()), dtype=np.int64)
+        counts = np.fromiter(level.values(), dtype=np.int64, count=len(level))
+        support = counts / n_baskets
+        expected = np.prod(item_counts[level_items] / n_baskets, axis=1)
+        found.append(pd.DataFrame({
+            'Items': list(map(tuple, names[level_items])),
+            'Size': size,
+            'Count': counts,
+            'Support': support,
+            'Lift': support / expected
+        }))
+        frequent = set(level)
+
+    if found:
+        result = pd.concat(found, ignore_index=True)[columns]
+        result = result.sort_values(['Size', 'Count', 'Items'], ascending=[True, False, True],
+                                    kind='mergesort').reset_index(drop=True)
+    else:
+        result = pd.DataFrame(columns=columns)
+    if stopped:
+        result.attrs['stopped'] = stopped
+    return result
+
+
+def _pack_row(items, count, summary):
+    """Pack pricing for any number of items: sum of average prices, 10% off."""
+    prices = [summary.at[item, 'Price'] for item in items]
+
+    # Logic: 10% Discount for the pack
+    total_price = sum(prices)
+    pack_price = total_price * 0.90
+
+    return {
+        'Pack Name': f"{' + '.join(map(str, items))} Bundle",
+        'Item A': items[0],
+        'Item B': items[1],
+        'Items': tuple(items),
+        'Pack Size': len(items),
+        'Times Bought Together': count,
+        'Total Value': round(total_price, 2),
+        'Suggested Pack Price (10% Off)': round(pack_price, 2),
+        'Savings': round(total_price - pack_price, 2)
+    }
+
+
+@cache_data(show_spinner=False)
+@traced()
+def suggest_packs(df, min_transactions=5, summary=None, top_n=10, max_pack_size=MAX_PACK_SIZE,
+                  memory_budget_mb=MINING_BUDGET_MB, _progress=None):
     """
     Analyzes products bought together and suggests packs.
+    Returns the top pairs first, then the top packs of each larger size up to max_pack_size.
+    If mining stopped early on its memory budget, attrs['note'] says so.
+    _progress(done, total) reports the mining stages (not part of the cache key).
     """
-    df = df.copy()
+    steps = 3 if max_pack_size > 2 else 2
+    _progress = _progress or (lambda done, total: None)
+    if summary is None:
+        summary = build_product_summary(df)
 
     # 1. Define the Basket
     basket_cols = get_basket_id(df)
 
-    # 2. Group products by Basket
-    # We only care about baskets with > 1 item
-    baskets = df.groupby(basket_cols)['Product'].apply(lambda x: sorted(list(set(x))))
-    baskets = baskets[baskets.apply(len) > 1]
-
-    if baskets.empty:
-        return pd.DataFrame()
+    # 2. Encode baskets x products (single items only add to product counts)
+    matrix, products = basket_incidence(df, basket_cols)
+    _progress(1, steps)
 
     # 3. Count Pairs
-    pair_counts = Counter()
-    for items in baskets:
-        # Generate all pairs of 2 products
-        pair_counts.update(combinations(items, 2))
+    pairs = pair_statistics(matrix, products, min_count=min_transactions).head(top_n)
+    _progress(2, steps)
+
+    if pairs.empty:
+        return pd.DataFrame()
 
     # 4. Convert to DataFrame
     suggestions = []
 
-    for (prod_a, prod_b), count in pair_counts.most_common(10):
-        if count < min_transactions:
-            continue
-
-        # Get individual prices to calculate pack price
-        price_a = df[df['Product'] == prod_a]['Price'].mean()
-        price_b = df[df['Product'] == prod_b]['Price'].mean()
-
-        # Logic: 10% Discount for the pack
-        total_price = price_a + price_b
-        pack_price = total_price * 0.90
-
-        suggestions.append({
-            'Pack Name': f"{prod_a} + {prod_b} Bundle",
-            'Item A': prod_a,
-            'Item B': prod_b,
-            'Times Bought Together': count,
-            'Total Value': round(total_price, 2),
-            'Suggested Pack Price (10% Off)': round(pack_price, 2),
-            'Savings': round(total_price - pack_price, 2)
+    for pair in pairs.itertuples(index=False):
+        row = _pack_row((pair[0], pair[1]), int(pair[2]), summary)
+        row.update({
+            'Support': round(pair[3], 4),
+            'Confidence (A→B)': round(pair[4], 3),
+            'Confidence (B→A)': round(pair[5], 3),
+            'Lift': round(pair[6], 2)
         })
+        suggestions.append(row)
+
+    # 5. Bigger bundles (3+ items)
+    note = None
+    if max_pack_size > 2:
+        itemsets = frequent_itemsets(matrix, products, min_transactions, max_pack_size, memory_budget_mb)
+        for _, group in itemsets.groupby('Size', sort=True):
+            for itemset in group.head(top_n).itertuples(index=False):
+                row = _pack_row(itemset.Items, int(itemset.Count), summary)
+                row.update({'Support': round(itemset.Support, 4), 'Lift': round(itemset.Lift, 2)})
+                suggestions.append(row)
+        note = itemsets.attrs.get('stopped')
+        _progress(3, steps)
 
-    return pd.DataFrame(suggestions)
\ No newline at end of file
+    result = pd.DataFrame(suggestions)
+    if note:
+        result.attrs['note'] = note
+    return result
@@ -1,107 +1,345 @@
 # src/predictor.py
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-import streamlit as st
-import matplotlib.pyplot as plt
+from src.st_compat import cache_data
 import io  # <--- NEW IMPORT
 import base64  # <--- NEW IMPORT
+import os
+import time
+import multiprocessing
+import multiprocessing.connection
+from src.product_summary import build_product_summary
+from src.tracing import trace, traced
+from src.forecast_cache import series_fingerprint, load_forecast, save_forecast, evict_forecasts
 
 
-@st.cache_data(show_spinner=False)
-def predict_top5_products_next30days(df):
-    if df.empty or 'Date' not in df.columns or 'Product' not in df.columns:
-        return pd.DataFrame(), None
+# --- FORECAST ENGINE SETTINGS ---
+# Workers default to all cores; set FORECAST_WORKERS=1 to fit one product at a time.
+# Every fit runs in a worker process, so FORECAST_TIMEOUT (seconds per product) always applies.
+FORECAST_HORIZON = 30
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS', os.cpu_count() or 1))
+FORECAST_TIMEOUT = float(os.environ.get('FORECAST_TIMEOUT', 120))
+
+# 'prophet' (full models), 'fast' (vectorized baseline only) or 'auto' (baseline + Prophet for big sellers)
+FORECAST_BACKEND = os.environ.get('FORECAST_BACKEND', 'prophet')
+AUTO_PROPHET_MIN_DAYS = 60
+BASELINE_WINDOW = 28
+BASELINE_ALPHA = 0.1
 
-    df['Date'] = pd.to_datetime(df['Date'])
-    daily_sales = df.groupby(['Date', 'Product'])['Quantity'].sum().reset_index()
-    forecasts = []
 
-    # Limit to top 50 products for speed
-    # NEW LINE (Faster & Stable):
-    top_products = df.groupby('Product')['Quantity'].sum().nlargest(20).index
+# Everything that changes the fitted model must be listed here, it is part of the cache key
+MODEL_SETTINGS = {'daily_seasonality': False, 'yearly_seasonality': True, 'country_holidays': 'TN'}
 
-    for product in top_products:
-        product_data = daily_sales[daily_sales['Product'] == product].copy()
-        if len(product_data) < 7: continue
 
-        prophet_df = product_data[['Date', 'Quantity']].rename(columns={'Date': 'ds', 'Quantity': 'y'})
-        prophet_df = prophet_df.sort_values('ds')
+def fit_product_forecast(prophet_df, periods=FORECAST_HORIZON):
+    """Fits one Prophet model and returns the predicted units over the horizon."""
+    from prophet import Prophet  # Heavy import, deferred until a model is actually fitted
 
+    m = Prophet(daily_seasonality=MODEL_SETTINGS['daily_seasonality'],
+                yearly_seasonality=MODEL_SETTINGS['yearly_seasonality'])
+    try:
+        m.add_country_holidays(country_name=MODEL_SETTINGS['country_holidays'])
+    except:
+        pass
+    m.fit(prophet_df)
+    future = m.make_future_dataframe(periods=periods)
+    forecast = m.predict(future)
+    return float(forecast['yhat'][-periods:].clip(lower=0).sum())
+
+
+def _forecast_worker(conn):
+    """Worker process: runs the (fit, prophet_df, periods) tasks sent over conn until it gets None."""
+    for fit, prophet_df, periods in iter(conn.recv, None):
         try:
-            m = Prophet(daily_seasonality=False, yearly_seasonality=True)
-            try:
-                m.add_country_holidays(country_name='TN')
-            except:
-                pass
-            m.fit(prophet_df)
-            future = m.make_future_dataframe(periods=30)
-            forecast = m.predict(future)
-            predicted_units = forecast['yhat'][-30:].clip(lower=0).sum()
-
-            # Demographics Logic
-            demo = df[df['Product'] == product]
-            total = len(demo)
-            male_pct = 50
-            if total > 0 and 'Customer_Gender' in demo.columns:
-                male_count = demo['Customer_Gender'].astype(str).str.lower().isin(['male', 'm']).sum()
-                male_pct = (male_count / total) * 100
-
-            top_age = "Unknown"
-            top_age_pct = 0
-            if total > 0 and 'Age_Group' in demo.columns:
-                age_counts = demo['Age_Group'].value_counts()
-                if not age_counts.empty:
-                    top_age = age_counts.index[0]
-                    top_age_pct = (age_counts.iloc[0] / total * 100)
-
-            forecasts.append({
-                'Product': product,
-                'Predicted_Units_Next30Days': int(predicted_units),
-                'Male_%': round(male_pct, 1),
-                'Female_%': round(100 - male_pct, 1),
-                'Top_Age_Group': top_age,
-                'Top_Age_%': round(top_age_pct, 1)
-            })
+            conn.send((True, fit(prophet_df, periods)))
         except Exception:
-            continue
+            conn.send((False, None))
+
+
+def _start_worker():
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_forecast_worker, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    return process, conn
+
+
+def _fit_products(product_series, max_workers, timeout, periods, on_done=None, fit=fit_product_forecast):
+    """
+    Runs the fits on up to max_workers worker processes, one product per worker at a time.
+    Each product gets `timeout` seconds from the moment its worker starts it; a fit still
+    running then is left out and its worker process is terminated (and replaced if products
+    remain). Failed fits are left out too. on_done() is called once per product, fitted or not.
+    """
+    results = {}
+    on_done = on_done or (lambda: None)
+    todo = list(product_series.items())
+    idle = [_start_worker() for _ in range(min(max_workers, len(todo)))]
+    running = {}  # conn -> (process, product, started)
+    try:
+        while todo or running:
+            while todo and idle:
+                process, conn = idle.pop()
+                product, prophet_df = todo.pop(0)
+                conn.send((fit, prophet_df, periods))
+                running[conn] = (process, product, time.monotonic())
+
+            next_deadline = min(started for _, _, started in running.values()) + timeout
+            for conn in multiprocessing.connection.wait(list(running),
+                                                        max(0.0, next_deadline - time.monotonic())):
+                process, product, _ = running.pop(conn)
+                try:
+                    ok, value = conn.recv()
+                except EOFError:  # The worker died mid-fit
+                    ok = False
+                    process.join()
+                    conn.close()
+                else:
+                    idle.append((process, conn))
+                if ok:
+                    results[product] = value
+                on_done()
+
+            now = time.monotonic()
+            for conn, (process, product, started) in list(running.items()):
+                if now - started >= timeout:
+                    del running[conn]
+                    process.terminate()
+                    process.join()
+                    conn.close()
+                    on_done()
+            while todo and len(idle) + len(running) < min(max_workers, len(todo) + len(running)):
+                idle.append(_start_worker())
+    finally:
+        for process, _, _ in running.values():  # Only left running if this loop raised
+            process.terminate()
+        for _, conn in idle:
+            conn.send(None)
+        for process, conn in idle + [(process, conn) for conn, (process, _, _) in running.items()]:
+            process.join()
+            conn.close()
+
+    # Input order, so the output never depends on scheduling
+    return {product: results[product] for product in product_series if product in results}
+
+
+@traced(rows=lambda args, kwargs: len(args[0]) if args else None)
+def forecast_products(product_series, max_workers=None, timeout=None, periods=FORECAST_HORIZON,
+                      use_cache=True, progress=None):
+    """
+    Fits one model per product concurrently on worker processes.
+    Products whose history is already in the on-disk cache are not refitted.
+    Returns {product: predicted_units} in the input order. Products that fail
+    or exceed the timeout are left out without cancelling the others.
+    progress(done, total) is called as products complete.
+    """
+    max_workers = max(1, int(max_workers or FORECAST_WORKERS))
+    timeout = FORECAST_TIMEOUT if timeout is None else timeout
+    settings = dict(MODEL_SETTINGS, periods=periods)
+
+    cached, keys, pending = {}, {}, {}
+    for product, prophet_df in product_series.items():
+        if use_cache:
+            keys[product] = series_fingerprint(prophet_df, settings)
+            value = load_forecast(keys[product])
+            if value is not None:
+                cached[product] = value
+                continue
+        pending[product] = prophet_df
+
+    done = len(cached)
+    total = len(product_series)
+
+    def on_done():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total)
+
+    if progress:
+        progress(done, total)
+    fitted = _fit_products(pending, max_workers, timeout, periods, on_done)
+
+    if use_cache and fitted:
+        for product, value in fitted.items():
+            save_forecast(keys[product], value)
+        evict_forecasts()
+
+    results = {}
+    for product in product_series:
+        if product in cached:
+            results[product] = cached[product]
+        elif product in fitted:
+            results[product] = fitted[product]
+    return results
+
+
+@traced()
+def baseline_forecast_matrix(daily_sales, products, periods=FORECAST_HORIZON, window=BASELINE_WINDOW,
+                             alpha=BASELINE_ALPHA):
+    """
+    Day-of-week weighted moving average, scored for every product in one NumPy pass.
+    Returns a product x day matrix of predicted units for the next `periods` days.
+    """
+    # Calendar days: timestamped rows must land on their day's column
+    dates = pd.to_datetime(daily_sales['Date']).dt.normalize()
+    last_date = dates.max()
+    days = pd.date_range(end=last_date, periods=window)
+
+    # Product x day matrix of the last `window` days, missing days are zero sales
+    in_window = (dates >= days[0]).to_numpy()
+    recent = daily_sales[in_window]
+    rows = pd.Index(products).get_indexer(recent['Product'])
+    cols = days.get_indexer(dates[in_window])
+    keep = (rows >= 0) & (cols >= 0)
+    matrix = np.zeros((len(products), window))
+    np.add.at(matrix, (rows[keep], cols[keep]), recent['Quantity'].to_numpy(dtype=float)[keep])
+
+    # Level: exponentially weighted mean, newest day weighs the most
+    weights = (1 - alpha) ** np.arange(window)[::-1]
+    level = matrix @ weights / weights.sum()
+
+    # Weekday profile relative to the window mean
+    weekday_onehot = np.eye(7)[days.dayofweek]
+    weekday_mean = (matrix @ weekday_onehot) / np.maximum(weekday_onehot.sum(axis=0), 1)
+    overall_mean = matrix.mean(axis=1, keepdims=True)
+    factors = np.divide(weekday_mean, overall_mean, out=np.ones_like(weekday_mean), where=overall_mean > 0)
 
-    if not forecasts:
+    future_weekdays = pd.date_range(last_date + pd.Timedelta(days=1), periods=periods).dayofweek
+    return np.clip(level[:, None] * factors[:, future_weekdays], 0, None)
+
+
+def _product_demographics(summary, product):
+    """Gender split and dominant age group of one product, read from the summary table."""
+    row = summary.loc[product]
+    total = row['Rows']
+    male_pct = 50
+    top_age = "Unknown"
+    top_age_pct = 0
+    if total > 0:
+        male_pct = (row['Male_Count'] / total) * 100
+        if row['Top_Age_Count'] > 0:
+            top_age = row['Top_Age_Group']
+            top_age_pct = (row['Top_Age_Count'] / total * 100)
+
+    return male_pct, top_age, top_age_pct
+
+
+@cache_data(show_spinner=False)
+@traced()
+def predict_top5_products_next30days(df, max_workers=None, timeout=None, backend=None, summary=None,
+                                     _progress=None):
+    """
+    backend: 'prophet' fits the top 20 products, 'fast' scores every product with
+    the vectorized baseline, 'auto' uses the baseline and refits only
+    high-volume products with Prophet.
+    _progress(done, total) reports fitted products (not part of the cache key).
+    """
+    if df.empty or 'Date' not in df.columns or 'Product' not in df.columns:
         return pd.DataFrame(), None
 
-    result_df = pd.DataFrame(forecasts).sort_values('Predicted_Units_Next30Days', ascending=False).head(5)
+    backend = backend or FORECAST_BACKEND
+    if backend not in ('prophet', 'fast', 'auto'):
+        raise ValueError(f"Unknown forecast backend: {backend}")
+    if summary is None:
+        summary = build_product_summary(df)
+
+    # One row per product and calendar day, whatever the time of day in the source.
+    # df is the shared session frame (this runs on a job thread), so it is never modified.
+    days = pd.to_datetime(df['Date']).dt.normalize()
+    daily_sales = df.groupby([days, 'Product'], observed=True)['Quantity'].sum().reset_index()
+    active_days = daily_sales.groupby('Product', observed=True).size()
+    eligible = active_days[active_days >= 7].index
+
+    predictions = {}
+
+    # --- FAST PATH: every product at once ---
+    if backend in ('fast', 'auto') and len(eligible):
+        forecast_matrix = baseline_forecast_matrix(daily_sales, eligible)
+        predictions.update(zip(eligible, forecast_matrix.sum(axis=1)))
+
+    # --- PROPHET: only the products worth a full model ---
+    if backend in ('prophet', 'auto'):
+        # Limit to top 50 products for speed
+        # NEW LINE (Faster & Stable):
+        top_products = summary['Quantity'].nlargest(20).index
+        min_days = AUTO_PROPHET_MIN_DAYS if backend == 'auto' else 7
+
+        # One split of the daily table instead of a scan per product
+        top_sales = daily_sales[daily_sales['Product'].isin(top_products)]
+        by_product = dict(list(top_sales.groupby('Product', observed=True)))
+
+        product_series = {}
+        for product in top_products:
+            product_data = by_product.get(product)
+            if product_data is None or len(product_data) < min_days: continue
+
+            prophet_df = product_data[['Date', 'Quantity']].rename(columns={'Date': 'ds', 'Quantity': 'y'})
+            product_series[product] = prophet_df.sort_values('ds')
+
+        predictions.update(forecast_products(product_series, max_workers=max_workers, timeout=timeout,
+                                             progress=_progress))
+    elif _progress:
+        _progress(1, 1)
+
+    if not predictions:
+        return pd.DataFrame(), None
+
+    ranked = pd.DataFrame({
+        'Product': list(predictions.keys()),
+        'Predicted_Units_Next30Days': [int(units) for units in predictions.values()]
+    }).sort_values('Predicted_Units_Next30Days', ascending=False, kind='mergesort').head(5)
+
+    # Demographics only for the five winners
+    forecasts = []
+    for product, predicted_units in zip(ranked['Product'], ranked['Predicted_Units_Next30Days']):
+        male_pct, top_age, top_age_pct = _product_demographics(summary, product)
+        forecasts.append({
+            'Product': product,
+            'Predicted_Units_Next30Days': int(predicted_units),
+            'Male_%': round(male_pct, 1),
+            'Female_%': round(100 - male_pct, 1),
+            'Top_Age_Group': top_age,
+            'Top_Age_%': round(top_age_pct, 1)
+        })
+
+    result_df = pd.DataFrame(forecasts, index=ranked.index)
 
     # --- THE FIX STARTS HERE ---
     # Create figure but DO NOT use st.pyplot() yet
-    fig, ax = plt.subplots(figsize=(10, 6))
-    result_df.set_index('Product')['Predicted_Units_Next30Days'].plot(
-        kind='barh', color='#00C28E', ax=ax, title='Top 5 Predicted Products (Next 30 Days)'
-    )
-    plt.tight_layout()
-
-    # Save to memory buffer
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", transparent=True)
-    buf.seek(0)
-
-    # Convert to base64 string
-    b64_string = base64.b64encode(buf.read()).decode()
-    chart_path = f"data:image/png;base64,{b64_string}"
-
-    plt.close(fig)  # Close to free memory
+    with trace('predictor.chart'):
+        import matplotlib.pyplot as plt  # Deferred like Prophet, only needed once there is a forecast
+        fig, ax = plt.subplots(figsize=(10, 6))
+        result_df.set_index('Product')['Predicted_Units_Next30Days'].plot(
+            kind='barh', color='#00C28E', ax=ax, title='Top 5 Predicted Products (Next 30 Days)'
+        )
+        plt.tight_layout()
+
+        # Save to memory buffer
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", transparent=True)
+        buf.seek(0)
+
+        # Convert to base64 string
+        b64_string = base64.b64encode(buf.read()).decode()
+        chart_path = f"data:image/png;base64,{b64_string}"
+
+        plt.close(fig)  # Close to free memory
     # --- THE FIX ENDS HERE ---
 
     return result_df, chart_path
 
 
-@st.cache_data
-def recommend_prices(df, top5_df):
+@cache_data
+@traced()
+def recommend_prices(df, top5_df, summary=None):
     if top5_df.empty: return pd.DataFrame()
+    if summary is None:
+        summary = build_product_summary(df)
     recommendations = []
     for product in top5_df['Product']:
-        product_data = df[df['Product'] == product]
-        if product_data.empty: continue
-        current_avg = product_data['Price'].mean()
+        if product not in summary.index: continue
+        current_avg = summary.at[product, 'Price']
         recommended = current_avg * 1.15
         recommendations.append({
             'Product': product,
@@ -0,0 +1,51 @@
+# src/product_summary.py
+import pandas as pd
+from src.tracing import traced
+
+
+@traced()
+def build_product_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per product, built in a single pass over the sales rows.
+    EDA, charts, forecasts, prices and packs read from this table instead of
+    filtering the full frame per product.
+    """
+    columns = ['Revenue', 'Quantity', 'Price', 'Category', 'Rows', 'Male_Count', 'Female_Count',
+               'Top_Age_Group', 'Top_Age_Count']
+    if df.empty or 'Product' not in df.columns:
+        return pd.DataFrame(columns=columns)
+
+    grouped = df.groupby('Product', sort=True, observed=True)
+    summary = pd.DataFrame({
+        'Revenue': grouped['Revenue'].sum() if 'Revenue' in df.columns else 0.0,
+        'Quantity': grouped['Quantity'].sum() if 'Quantity' in df.columns else 0,
+        'Price': grouped['Price'].mean().astype(float) if 'Price' in df.columns else 0.0,
+        'Category': grouped['Category'].first() if 'Category' in df.columns else 'General',
+        'Rows': grouped.size(),
+    })
+
+    # --- GENDER COUNTS ---
+    if 'Customer_Gender' in df.columns:
+        gender = df['Customer_Gender'].astype(str).str.lower()
+        summary['Male_Count'] = gender.isin(['male', 'm']).groupby(df['Product'], observed=True).sum()
+        summary['Female_Count'] = gender.isin(['female', 'f']).groupby(df['Product'], observed=True).sum()
+    else:
+        summary['Male_Count'] = 0
+        summary['Female_Count'] = 0
+
+    # --- AGE GROUP COUNTS (most frequent group per product) ---
+    if 'Age_Group' in df.columns:
+        age_counts = df.groupby(['Product', 'Age_Group'], observed=True).size()
+        age_counts = age_counts[age_counts > 0].sort_values(ascending=False, kind='mergesort')
+        top_age = age_counts[~age_counts.index.get_level_values(0).duplicated()]
+        products = top_age.index.get_level_values(0)
+        summary['Top_Age_Group'] = pd.Series(top_age.index.get_level_values(1).astype(object), index=products)
+        summary['Top_Age_Group'] = summary['Top_Age_Group'].fillna('Unknown')
+        summary['Top_Age_Count'] = pd.Series(top_age.values, index=products)
+        summary['Top_Age_Count'] = summary['Top_Age_Count'].fillna(0).astype(int)
+    else:
+        summary['Top_Age_Group'] = 'Unknown'
+        summary['Top_Age_Count'] = 0
+
+    summary[['Male_Count', 'Female_Count']] = summary[['Male_Count', 'Female_Count']].fillna(0).astype(int)
+    return summary[columns]
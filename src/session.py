@@ -0,0 +1,51 @@
+# src/session.py
+
+
+class DatasetSession:
+    """
+    One loaded dataset and everything derived from it.
+    Each artifact is built the first time it is asked for and then reused,
+    keyed by its name plus the parameters it depends on. Widget clicks that
+    don't change those parameters never recompute (or rehash) anything.
+    """
+
+    def __init__(self, dataset_id, df):
+        self.dataset_id = dataset_id
+        self.df = df
+        self._artifacts = {}
+
+    def artifact(self, name, builder, *params):
+        """
+        Returns the artifact `name` for these (hashable) params, calling builder() on first use.
+        """
+        key = (name,) + params
+        if key not in self._artifacts:
+            self._artifacts[key] = builder()
+        return self._artifacts[key]
+
+    def has(self, name, *params):
+        return ((name,) + params) in self._artifacts
+
+    def forget(self, name):
+        """Drops every cached version of one artifact."""
+        self._artifacts = {k: v for k, v in self._artifacts.items() if k[0] != name}
+
+
+def open_dataset(state, dataset_id, loader, key='dataset'):
+    """
+    Returns the DatasetSession stored in `state` (e.g. st.session_state) for this dataset ID.
+    The loader runs only when the ID differs from the session already held.
+    """
+    session = state.get(key)
+    if session is None or session.dataset_id != dataset_id:
+        session = DatasetSession(dataset_id, loader())
+        state[key] = session
+    return session
+
+
+def current_dataset(state, prefix='', key='dataset'):
+    """The dataset already held in `state` if its ID starts with prefix, else None."""
+    session = state.get(key)
+    if session is not None and str(session.dataset_id).startswith(prefix):
+        return session
+    return None
@@ -0,0 +1,15 @@
+# src/st_compat.py
+import sys
+
+
+def cache_data(func=None, **kwargs):
+    """
+    st.cache_data inside the Streamlit app, a plain pass-through otherwise.
+    Analysis modules use this so headless/batch runs never import Streamlit.
+    """
+    if 'streamlit' in sys.modules:
+        import streamlit as st
+        return st.cache_data(func, **kwargs) if func is not None else st.cache_data(**kwargs)
+    if func is None:
+        return lambda f: f
+    return func
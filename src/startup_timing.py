@@ -0,0 +1,101 @@
+# src/startup_timing.py
+"""
+Cold-start import report, built on `python -X importtime`.
+
+    python -m src.startup_timing                 # modules the dashboard imports
+    python -m src.startup_timing src.predictor prophet --top 20 --target-ms 1500
+
+Each run happens in a fresh interpreter, so nothing is already cached in sys.modules.
+Exits with status 1 when the total is over the target (usable as a CI check).
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+
+# --- STARTUP SETTINGS ---
+STARTUP_TARGET_MS = float(os.environ.get('STARTUP_TARGET_MS', 3000))
+
+# What main.py imports at load, in the same order
+APP_MODULES = [
+    'streamlit', 'streamlit_authenticator', 'pandas',
+    'src.auth_store', 'src.data_loader', 'src.fb_ads_loader', 'src.eda', 'src.insights_ai',
+    'src.predictor', 'src.facebook_integraation', 'src.pack_generator', 'src.product_summary',
+    'src.dataset_store', 'src.session', 'src.jobs',
+]
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into dicts with module, self_ms, cumulative_ms and depth.
+    depth 0 entries are the imports the measured code asked for (or their first trigger).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            'depth': max(depth, 0),
+        })
+    return rows
+
+
+def profile_imports(modules=None, python=None, cwd=None):
+    """
+    Imports `modules` in a fresh interpreter with -X importtime.
+    Returns {'total_ms', 'modules': [per requested module, in order], 'heaviest': [all, slowest first]}.
+    A requested module that was already pulled in by an earlier one costs ~0 ms in its own row.
+    """
+    modules = modules or APP_MODULES
+    code = '; '.join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=cwd or os.getcwd(),
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+        raise RuntimeError(f"Import failed: {last_line}")
+
+    rows = parse_importtime(proc.stderr)
+    top_level = {r['module']: r['cumulative_ms'] for r in rows if r['depth'] == 0}
+    per_module = [{'module': m, 'cumulative_ms': top_level.get(m, 0.0)} for m in modules]
+    return {
+        'total_ms': sum(r['cumulative_ms'] for r in rows if r['depth'] == 0),
+        'modules': per_module,
+        'heaviest': sorted(rows, key=lambda r: r['cumulative_ms'], reverse=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold-start import times.")
+    parser.add_argument('modules', nargs='*', help="Modules to import (default: what the dashboard imports)")
+    parser.add_argument('--top', type=int, default=15, help="How many of the heaviest imports to list")
+    parser.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS, help="Cold-start budget")
+    args = parser.parse_args(argv)
+
+    report = profile_imports(args.modules or None)
+    print(f"{'module':<40} {'cumulative':>12}")
+    for row in report['modules']:
+        print(f"{row['module']:<40} {row['cumulative_ms']:>10.1f}ms")
+
+    print(f"\nHeaviest imports (including dependencies):")
+    for row in report['heaviest'][:args.top]:
+        print(f"{row['module']:<40} {row['cumulative_ms']:>10.1f}ms  (self {row['self_ms']:.1f}ms)")
+
+    over = report['total_ms'] > args.target_ms
+    print(f"\n{'❌' if over else '✅'} Total {report['total_ms']:.0f}ms (target {args.target_ms:.0f}ms)")
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
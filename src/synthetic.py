@@ -0,0 +1,142 @@
+# src/synthetic.py
+"""
+Vectorized synthetic sales data in the canonical schema, from 10k to 10M+ rows.
+Used by the benchmark suite; no Python loop runs per row.
+"""
+import numpy as np
+import pandas as pd
+
+
+# --- GENERATOR SETTINGS ---
+AGE_GROUPS = ['18-24', '25-34', '35-44', '45-54', '55+']
+AGE_WEIGHTS = [0.2, 0.35, 0.25, 0.12, 0.08]
+GENDERS = ['Male', 'Female']
+STATUSES = ['Livré', 'Livré', 'Livré', 'En cours', 'Annulé']
+
+# French export headers, all recognized by the loader's keyword mapping
+FRENCH_HEADERS = {
+    'Date': 'Date de commande',
+    'Product': 'Article',
+    'Category': 'Famille',
+    'Quantity': 'Qté',
+    'Price': 'Prix unitaire',
+    'Revenue': 'Montant TTC',
+    'Customer_Gender': 'Sexe',
+    'Age_Group': 'Age client',
+    'Status': 'Statut',
+}
+
+
+def _product_catalog(n_products, n_categories, rng):
+    """Names, categories and list prices for the catalog; popularity follows a Zipf-like curve."""
+    names = pd.Index([f"Produit {i:05d}" for i in range(n_products)])
+    categories = np.array([f"Famille {i:02d}" for i in range(n_categories)])
+    product_category = categories[rng.integers(0, n_categories, n_products)]
+    prices = np.round(rng.lognormal(mean=3.5, sigma=0.8, size=n_products), 3)
+    return names, product_category, prices
+
+
+def generate_sales(n_rows, n_products=200, n_categories=12, days=365, basket_size=2.5, affinity=0.6,
+                   zipf=1.1, end=None, seed=0):
+    """
+    Returns n_rows order lines in the canonical schema (see data_loader.CANONICAL_COLUMNS).
+
+    Lines are grouped into baskets of about `basket_size` items sharing one date and
+    customer. The first item of a basket is drawn by popularity; each further item is,
+    with probability `affinity`, one of the anchor's two neighbours in the catalog,
+    which gives pack mining real pairs and triples to find.
+    """
+    rng = np.random.default_rng(seed)
+    names, product_category, list_prices = _product_catalog(n_products, n_categories, rng)
+
+    # --- BASKETS ---
+    n_baskets = max(1, int(round(n_rows / basket_size)))
+    basket_of_row = np.sort(rng.integers(0, n_baskets, n_rows))
+    first_in_basket = np.r_[True, basket_of_row[1:] != basket_of_row[:-1]]
+
+    popularity = 1.0 / np.arange(1, n_products + 1) ** zipf
+    popularity /= popularity.sum()
+    anchors = rng.choice(n_products, size=n_baskets, p=popularity)
+
+    random_pick = rng.choice(n_products, size=n_rows, p=popularity)
+    neighbour = (anchors[basket_of_row] + rng.choice([1, 2], size=n_rows)) % n_products
+    product = np.where(rng.random(n_rows) < affinity, neighbour, random_pick)
+    product = np.where(first_in_basket, anchors[basket_of_row], product)
+
+    # --- BASKET-LEVEL ATTRIBUTES (date and customer) ---
+    end = pd.Timestamp(end or pd.Timestamp.today().normalize())
+    basket_day = rng.integers(0, days, n_baskets)
+    dates = end - pd.to_timedelta(days - 1 - basket_day[basket_of_row], unit='D')
+    gender = rng.choice(len(GENDERS), size=n_baskets, p=[0.45, 0.55])[basket_of_row]
+    age = rng.choice(len(AGE_GROUPS), size=n_baskets, p=AGE_WEIGHTS)[basket_of_row]
+
+    # --- LINE VALUES ---
+    quantity = rng.geometric(0.6, n_rows).astype(np.int32)
+    price = np.round(list_prices[product] * rng.uniform(0.9, 1.1, n_rows), 3)
+
+    return pd.DataFrame({
+        'Date': dates,
+        'Product': pd.Categorical.from_codes(product, names),
+        'Category': product_category[product],
+        'Quantity': quantity,
+        'Price': price,
+        'Revenue': np.round(price * quantity, 3),
+        'Customer_Gender': pd.Categorical.from_codes(gender, GENDERS),
+        'Age_Group': pd.Categorical.from_codes(age, AGE_GROUPS),
+    })
+
+
+def format_amounts(values, rng):
+    """
+    Money as a messy export would write it: '45.5', '45,5 DT', 'TND 1 234,5', '$45.5'...
+    A small share of cells is left empty. Amounts are rounded to 2 decimals so that
+    '33,381' (thousands or millimes?) never appears; that case is ambiguous for any reader.
+    """
+    values = pd.Series(values).round(2)
+    plain = values.astype(str)
+    comma = plain.str.replace('.', ',', regex=False)
+    # French grouping only for amounts >= 1000, e.g. "1 234,5"
+    grouped = comma.str.replace(r'^(-?\d+)(\d{3}),', r'\1 \2,', regex=True)
+
+    style = rng.integers(0, 5, len(values))
+    out = plain.copy()
+    out[style == 1] = comma[style == 1] + ' DT'
+    out[style == 2] = 'TND ' + grouped[style == 2]
+    out[style == 3] = '$' + plain[style == 3]
+    out[style == 4] = grouped[style == 4] + ' dt'
+    out[rng.random(len(values)) < 0.002] = ''
+    return out
+
+
+def messy_export(df, french=False, messy=True, title_rows=2, seed=0):
+    """
+    Turns a canonical frame into what a client actually sends: currency strings,
+    day-first date strings, a status column with cancelled orders, report title
+    rows above the header, and optionally French headers.
+    Returns a frame of strings whose first rows are the titles and the header.
+    """
+    rng = np.random.default_rng(seed)
+    out = df.copy()
+    out['Status'] = np.array(STATUSES)[rng.integers(0, len(STATUSES), len(out))]
+    if messy:
+        out['Date'] = out['Date'].dt.strftime('%d/%m/%Y')
+        out['Price'] = format_amounts(out['Price'].to_numpy(), rng)
+        out['Revenue'] = format_amounts(out['Revenue'].to_numpy(), rng)
+    if french:
+        out = out.rename(columns=FRENCH_HEADERS)
+
+    header = pd.DataFrame([out.columns], columns=out.columns)
+    titles = pd.DataFrame([[''] * len(out.columns)] * title_rows, columns=out.columns)
+    if title_rows:
+        titles.iloc[0, 0] = 'Rapport des ventes' if french else 'Sales report'
+    return pd.concat([titles, header, out.astype(str)], ignore_index=True)
+
+
+def write_dataset(df, path, french=False, messy=True, seed=0):
+    """Writes a messy export to .csv (';' separated when French) or .xlsx."""
+    export = messy_export(df, french=french, messy=messy, title_rows=2 if messy else 0, seed=seed)
+    if str(path).lower().endswith(('.xlsx', '.xls')):
+        export.to_excel(path, header=False, index=False)
+    else:
+        export.to_csv(path, header=False, index=False, sep=';' if french else ',')
+    return path
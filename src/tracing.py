@@ -0,0 +1,181 @@
+# src/tracing.py
+"""
+Lightweight tracing for the pipeline stages.
+
+    with trace('forecast.fit', rows=len(df)) as span:
+        ...
+        span['rows'] = n   # may be set or refined inside the block
+
+    @traced('eda.summary')
+    def build_product_summary(df): ...
+
+Every span records wall time, rows processed and the change in process memory.
+Spans are logged as one JSON line each (logger 'sales_ai.trace'), kept in a
+bounded in-process buffer, and collected per dashboard run by collect().
+"""
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# --- TRACE SETTINGS ---
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') not in ('0', 'false', 'False', '')
+MAX_RECENT_SPANS = 500
+
+logger = logging.getLogger('sales_ai.trace')
+if TRACE_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_recent = deque(maxlen=MAX_RECENT_SPANS)
+_recent_lock = threading.Lock()
+_run_spans = contextvars.ContextVar('run_spans', default=None)
+_depth = contextvars.ContextVar('span_depth', default=0)
+
+
+def _rss_mb():
+    """Current resident memory of this process in MB (None where it can't be read)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def collect():
+    """
+    Starts a new list of spans for the current run (one Streamlit script run or one CLI call)
+    and returns it; spans finished in this thread are appended to it.
+    """
+    spans = []
+    _run_spans.set(spans)
+    return spans
+
+
+def recent_spans(limit=None):
+    """Latest spans from every thread (background jobs included), newest last."""
+    with _recent_lock:
+        spans = list(_recent)
+    return spans[-limit:] if limit else spans
+
+
+@contextmanager
+def trace(stage, rows=None, **fields):
+    """Times the block as one span; extra keyword fields are logged with it."""
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    span = {'stage': stage, 'rows': rows, **fields, 'start': time.time()}
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    try:
+        yield span
+        span.setdefault('status', 'ok')
+    except BaseException as e:
+        span['status'] = 'error'
+        span['error'] = type(e).__name__
+        raise
+    finally:
+        _depth.reset(token)
+        rss_after = _rss_mb()
+        span['seconds'] = round(time.perf_counter() - started, 4)
+        span['mem_delta_mb'] = round(rss_after - rss_before, 1) if rss_before is not None else None
+        span['depth'] = depth
+        span['thread'] = threading.current_thread().name
+        _record(span)
+
+
+def _record(span):
+    with _recent_lock:
+        _recent.append(span)
+    run = _run_spans.get()
+    if run is not None:
+        run.append(span)
+    if TRACE_LOG:
+        logger.info(json.dumps({'event': 'span', **span}, default=str))
+
+
+def _default_rows(args, kwargs):
+    # Rows processed = length of the first DataFrame argument
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, pd.DataFrame):
+            return len(value)
+    return None
+
+
+def traced(stage=None, rows=None):
+    """
+    Decorator form of trace(). rows may be a function of (args, kwargs); by default
+    it is the length of the first DataFrame argument, else of a DataFrame result.
+    """
+    def decorator(func):
+        name = stage or f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace(name, rows=(rows or _default_rows)(args, kwargs)) as span:
+                result = func(*args, **kwargs)
+                if span['rows'] is None and isinstance(result, pd.DataFrame):
+                    span['rows'] = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+# --- ONE-OFF PROFILING ---
+def start_profile(kind='cprofile'):
+    """
+    Starts a profiler for one run. kind is 'pyinstrument' (if installed) or 'cprofile'.
+    Returns a handle for stop_profile().
+    """
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return ('pyinstrument', profiler)
+        except ImportError:
+            print("pyinstrument is not installed, using cProfile")
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return ('cprofile', profiler)
+
+
+def stop_profile(handle, limit=40):
+    """Stops the profiler and returns its report as text."""
+    kind, profiler = handle
+    if kind == 'pyinstrument':
+        profiler.stop()
+        return profiler.output_text(unicode=True, color=False)
+
+    import io
+    import pstats
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def spans_frame(spans):
+    """Spans as a table in start order, nested stages indented under their parents."""
+    if not spans:
+        return pd.DataFrame(columns=['Stage', 'Seconds', 'Rows', 'Mem Δ MB', 'Thread'])
+    spans = sorted(spans, key=lambda s: s['start'])
+    return pd.DataFrame({
+        'Stage': ['  ' * s.get('depth', 0) + s['stage'] for s in spans],
+        'Seconds': [s['seconds'] for s in spans],
+        'Rows': [s.get('rows') for s in spans],
+        'Mem Δ MB': [s.get('mem_delta_mb') for s in spans],
+        'Thread': [s.get('thread') for s in spans],
+    })
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from src.data_loader import _load_excel_sheet, clean_numeric_column, load_data, parse_dates
+
+
+def test_iso_timestamps_with_offsets_keep_month_first():
+    values = pd.Series(['2024-01-02T10:00:00Z', '2024-01-02T10:00:00+02:00', '2024-01-05T23:30:00-05:00'])
+    parsed = parse_dates(values, [])
+
+    assert parsed.dt.tz is None
+    assert list(parsed) == [pd.Timestamp('2024-01-02 10:00'), pd.Timestamp('2024-01-02 08:00'),
+                            pd.Timestamp('2024-01-06 04:30')]
+
+
+def test_unmatched_year_first_values_are_not_read_day_first():
+    parsed = parse_dates(pd.Series(['2024.01.02 10:00:00 +0100', '3 Feb 2024']), [])
+    assert list(parsed) == [pd.Timestamp('2024-01-02 09:00'), pd.Timestamp('2024-02-03')]
+
+
+def test_chunked_load_matches_whole_file_with_undated_footer(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.layout_cache.LAYOUT_CACHE', False)
+    path = tmp_path / 'sales.csv'
+    path.write_text('Date,Product,Quantity,Price\n02/01/2024,A,1,10\n03/01/2024,B,1,10\n'
+                    '04/01/2024,A,1,10\n05/01/2024,B,1,10\nTOTAL,,4,40\n')
+
+    whole = load_data(str(path))
+    chunked = load_data(str(path), chunksize=4)
+
+    assert len(chunked) == 4 and chunked['Date'].notna().all()
+    pd.testing.assert_frame_equal(chunked.reset_index(drop=True), whole.reset_index(drop=True))
+
+
+def test_excel_blocks_skip_undated_rows_and_accept_small_block_sizes(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.layout_cache.LAYOUT_CACHE', False)
+    path = tmp_path / 'sales.xlsx'
+    pd.DataFrame({'Date': ['02/01/2024', '03/01/2024', '04/01/2024', 'TOTAL', None],
+                  'Product': ['A', 'B', 'A', None, None],
+                  'Quantity': [1, 1, 1, 3, None],
+                  'Price': [10, 10, 10, 30, None]}).to_excel(path, sheet_name='Sales', index=False)
+
+    # The second block holds only the footer rows; the head sample alone exceeds block_rows=1
+    for max_scan, block_rows in ((1, 3), (20, 1)):
+        final_df, _, _ = _load_excel_sheet(str(path), 'Sales', block_rows=block_rows, max_scan=max_scan)
+        assert len(final_df) == 3 and final_df['Date'].notna().all()
+        assert final_df['Revenue'].sum() == 30
+
+
+def test_numeric_cleaning_handles_currencies_and_decimal_commas():
+    raw = pd.Series(['1 234,56 DT', '12,5', '1,234', '1.234.567', '$1,234.50', '€\u00a03,00', '1.234,5',
+                     7, '', '  ', 'n/a', None], dtype=object)
+    values, coerced = clean_numeric_column(raw)
+
+    assert values[:8].tolist() == [1234.56, 12.5, 1234.0, 1234567.0, 1234.5, 3.0, 1234.5, 7.0]
+    # Blank cells become 0 without being counted; text that is not a number is counted
+    assert values[8:11].tolist() == [0.0, 0.0, 0.0] and np.isnan(values[11])
+    assert coerced == 1
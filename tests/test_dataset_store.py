@@ -0,0 +1,63 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from src import dataset_store
+from src.data_loader import compact_frame
+from src.dataset_store import content_hash, evict_datasets, load_cached_dataset, save_cached_dataset
+
+pytestmark = pytest.mark.skipif(not dataset_store.HAS_PARQUET, reason='needs pyarrow')
+
+
+def _frame():
+    return pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=4),
+        'Product': ['Lamp', 'Desk', 'Lamp', 'Mug'],
+        'Category': 'Home',
+        'Quantity': [1, 2, 3, 4],
+        'Price': [10.0, 20.0, 10.0, 5.5],
+        'Revenue': [10.0, 40.0, 30.0, 22.0],
+        'Customer_Gender': 'Unknown',
+        'Age_Group': 'Unknown',
+    })
+
+
+def test_round_trip_returns_the_compact_frame(tmp_path):
+    digest = content_hash(b'Date,Product\n')
+    save_cached_dataset(digest, _frame(), store_dir=str(tmp_path))
+
+    loaded = load_cached_dataset(digest, store_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(loaded, compact_frame(_frame()))
+    assert load_cached_dataset(content_hash(b'other'), store_dir=str(tmp_path)) is None
+
+
+def test_version_bump_invalidates_stored_uploads(tmp_path, monkeypatch):
+    data = b'Date,Product\n2024-01-01,Lamp\n'
+    save_cached_dataset(content_hash(data), _frame(), store_dir=str(tmp_path))
+
+    monkeypatch.setattr(dataset_store, 'STORE_VERSION', dataset_store.STORE_VERSION + 1)
+    assert load_cached_dataset(content_hash(data), store_dir=str(tmp_path)) is None
+
+
+def test_hash_of_a_path_matches_hash_of_its_bytes(tmp_path):
+    path = tmp_path / 'upload.csv'
+    path.write_bytes(b'x' * (3 * 1024 * 1024 + 7))
+    assert content_hash(str(path)) == content_hash(path.read_bytes())
+
+
+def test_eviction_drops_expired_then_least_recently_used(tmp_path):
+    store_dir = str(tmp_path)
+    now = time.time()
+    ages = {'expired': 40, 'old': 2, 'new': 1}
+    for name in ages:
+        save_cached_dataset(name, _frame(), store_dir=store_dir)  # Each save also trims the store
+    for name, age_days in ages.items():
+        mtime = now - age_days * 86400
+        os.utime(tmp_path / f"{name}.parquet", (mtime, mtime))
+
+    assert evict_datasets(store_dir, max_age_days=30) == 1
+    size = os.path.getsize(tmp_path / 'new.parquet')
+    assert evict_datasets(store_dir, max_bytes=size, max_age_days=30) == 1
+    assert sorted(os.listdir(store_dir)) == ['new.parquet']
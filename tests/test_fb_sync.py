@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from src.fb_sync import InsightsStore, sync_account
+
+
+class _Fetcher:
+    """Records every requested shard and returns one row per day."""
+
+    def __init__(self):
+        self.days = set()
+
+    def fetch(self, account_id, since, until):
+        day, last = date.fromisoformat(since), date.fromisoformat(until)
+        rows = []
+        while day <= last:
+            self.days.add(day)
+            rows.append({'date_start': day.isoformat(), 'ad_id': '1', 'ad_name': 'Ad', 'spend': '1'})
+            day += timedelta(days=1)
+        return rows
+
+
+def test_sync_fetches_every_gap_between_windows(tmp_path):
+    store = InsightsStore(str(tmp_path / 'insights.sqlite'))
+    fetcher = _Fetcher()
+    sync_account('1', fetcher, store, days_back=30, today=date(2024, 1, 30), workers=1)
+    sync_account('1', fetcher, store, days_back=30, today=date(2024, 6, 30), workers=1)
+    assert store.synced_ranges('act_1') == [(date(2024, 1, 1), date(2024, 1, 30)),
+                                            (date(2024, 6, 1), date(2024, 6, 30))]
+
+    fetcher.days.clear()
+    raw, _ = sync_account('1', fetcher, store, days_back=200, today=date(2024, 6, 30), workers=1)
+
+    gap = {date(2024, 1, 31) + timedelta(days=i) for i in range((date(2024, 6, 1) - date(2024, 1, 31)).days)}
+    assert gap <= fetcher.days
+    assert not fetcher.days & {date(2024, 1, 15), date(2024, 6, 10)}
+    assert len(raw) == 200
+    assert store.synced_ranges('act_1') == [(date(2023, 12, 14), date(2024, 6, 30))]
@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+from src import forecast_cache, predictor
+from src.forecast_cache import evict_forecasts, load_forecast, save_forecast, series_fingerprint
+
+SETTINGS = {'yearly_seasonality': True, 'periods': 30}
+
+
+def _series(values):
+    return pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=len(values)), 'y': values})
+
+
+def test_fingerprint_follows_history_and_settings_not_row_order():
+    series = _series([1, 2, 3, 4])
+    key = series_fingerprint(series, SETTINGS)
+
+    assert series_fingerprint(series.iloc[::-1], SETTINGS) == key
+    assert series_fingerprint(_series([1, 2, 3, 5]), SETTINGS) != key
+    assert series_fingerprint(series, dict(SETTINGS, periods=60)) != key
+
+
+def test_round_trip_and_miss(tmp_path):
+    save_forecast('abc', 123.5, cache_dir=str(tmp_path))
+
+    assert load_forecast('abc', cache_dir=str(tmp_path)) == 123.5
+    assert load_forecast('missing', cache_dir=str(tmp_path)) is None
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path):
+    cache_dir = str(tmp_path)
+    for i, key in enumerate(['old', 'mid', 'new']):
+        save_forecast(key, float(i), cache_dir=cache_dir)
+        os.utime(tmp_path / f"{key}.pkl", (1000 + i, 1000 + i))
+    load_forecast('old', cache_dir=cache_dir)  # A hit makes it the most recently used
+
+    assert evict_forecasts(cache_dir, max_entries=2) == 1
+    assert load_forecast('mid', cache_dir=cache_dir) is None
+    assert load_forecast('old', cache_dir=cache_dir) == 0.0
+
+    assert evict_forecasts(cache_dir, max_bytes=0) == 2
+    assert os.listdir(cache_dir) == []
+
+
+def test_forecast_products_skips_fitting_cached_products(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecast_cache, 'CACHE_DIR', str(tmp_path))
+    fitted = []
+
+    def fake_fit(product_series, max_workers, timeout, periods, on_done=None):
+        fitted.extend(product_series)
+        return {product: 7.0 for product in product_series}
+
+    monkeypatch.setattr(predictor, '_fit_products', fake_fit)
+    series = {'A': _series([1, 2, 3]), 'B': _series([4, 5, 6])}
+
+    assert predictor.forecast_products(series) == {'A': 7.0, 'B': 7.0}
+    assert predictor.forecast_products(series) == {'A': 7.0, 'B': 7.0}
+    assert fitted == ['A', 'B']
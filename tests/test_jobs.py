@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import time
+
+from src.jobs import DONE, FAILED, INTERRUPTED, RUNNING, JobQueue
+
+
+def _wait(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_identical_submissions_share_one_job():
+    queue = JobQueue(max_workers=2)
+    calls = []
+    release = threading.Event()
+
+    def work(progress):
+        calls.append(1)
+        release.wait(5)
+        progress(1, 1)
+        return 'result'
+
+    first = queue.submit('forecast', 'ds1', work, 'fast')
+    second = queue.submit('forecast', 'ds1', work, 'fast')
+    other = queue.submit('forecast', 'ds1', work, 'prophet')
+    release.set()
+
+    assert second is first and other is not first
+    assert _wait(first).status == DONE and first.result == 'result'
+    assert _wait(other).status == DONE
+    assert len(calls) == 2
+
+
+def test_failed_job_stays_failed_until_retried():
+    queue = JobQueue(max_workers=1)
+    attempts = []
+
+    def flaky(progress):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return 'ok'
+
+    job = _wait(queue.submit('packs', 'ds1', flaky))
+    assert job.status == FAILED and job.error == 'boom'
+
+    assert queue.submit('packs', 'ds1', flaky) is job
+    assert len(attempts) == 1
+
+    retried = _wait(queue.submit('packs', 'ds1', flaky, retry=True))
+    assert retried is not job and retried.status == DONE and retried.result == 'ok'
+    assert len(attempts) == 2
+
+
+def test_sqlite_mirror_marks_unfinished_jobs_interrupted(tmp_path):
+    db_path = str(tmp_path / 'jobs.sqlite')
+    queue = JobQueue(max_workers=1, db_path=db_path)
+    release = threading.Event()
+    _wait(queue.submit('eda', 'ds1', lambda progress: 'ok'))
+    stuck = queue.submit('eda', 'ds2', lambda progress: release.wait(5))
+    while stuck.status != RUNNING:
+        time.sleep(0.01)
+
+    JobQueue(max_workers=1, db_path=db_path)  # A restarted process
+    conn = sqlite3.connect(db_path)
+    try:
+        statuses = dict(conn.execute("SELECT dataset_id, status FROM jobs").fetchall())
+    finally:
+        conn.close()
+    release.set()
+    _wait(stuck)
+
+    assert statuses == {'ds1': DONE, 'ds2': INTERRUPTED}
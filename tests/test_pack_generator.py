@@ -0,0 +1,70 @@
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from src.pack_generator import basket_incidence, frequent_itemsets, pair_statistics, suggest_packs
+
+
+def _orders(n_orders=300, seed=0):
+    """Order lines with repeated products inside some baskets."""
+    rng = np.random.default_rng(seed)
+    products = [f"P{i}" for i in range(12)]
+    rows = []
+    for order in range(n_orders):
+        for product in rng.choice(products, rng.integers(1, 6)):
+            rows.append((order, product))
+    return pd.DataFrame(rows, columns=['Order', 'Product'])
+
+
+def _baskets(df):
+    return [frozenset(items) for _, items in df.groupby('Order')['Product']]
+
+
+def test_pair_counts_match_brute_force():
+    df = _orders()
+    baskets = _baskets(df)
+    matrix, products = basket_incidence(df, ['Order'])
+    pairs = pair_statistics(matrix, products, min_count=2)
+
+    expected = Counter(pair for basket in baskets for pair in combinations(sorted(basket), 2))
+    expected = {pair: count for pair, count in expected.items() if count >= 2}
+    got = {(a, b): count for a, b, count in zip(pairs['Item A'], pairs['Item B'], pairs['Count'])}
+    assert got == expected
+
+    items = Counter(item for basket in baskets for item in basket)
+    top = pairs.iloc[0]
+    n = len(baskets)
+    assert np.isclose(top['Support'], top['Count'] / n)
+    assert np.isclose(top['Confidence (A→B)'], top['Count'] / items[top['Item A']])
+    assert np.isclose(top['Lift'], (top['Count'] / n) / ((items[top['Item A']] / n) * (items[top['Item B']] / n)))
+    assert pairs['Count'].is_monotonic_decreasing
+
+
+def test_apriori_finds_exactly_the_frequent_itemsets():
+    df = _orders(n_orders=400, seed=3)
+    baskets = _baskets(df)
+    matrix, products = basket_incidence(df, ['Order'])
+    itemsets = frequent_itemsets(matrix, products, min_count=4, max_size=4)
+
+    expected = Counter(items for basket in baskets for size in (3, 4)
+                       for items in combinations(sorted(basket), size))
+    expected = {items: count for items, count in expected.items() if count >= 4}
+    assert dict(zip(itemsets['Items'], itemsets['Count'])) == expected
+    assert set(itemsets['Size']) == {3, 4}
+    assert 'stopped' not in itemsets.attrs
+
+
+def test_memory_budget_stops_mining_and_is_reported():
+    df = _orders()
+    matrix, products = basket_incidence(df, ['Order'])
+    itemsets = frequent_itemsets(matrix, products, min_count=2, max_size=4, memory_budget_mb=0.001)
+
+    assert itemsets.empty
+    assert itemsets.attrs['stopped'].startswith('Packs of 3+ products were skipped')
+
+    orders = df.rename(columns={'Order': 'Order_ID'}).assign(Quantity=1, Price=10.0, Revenue=10.0)
+    packs = suggest_packs(orders, min_transactions=2, memory_budget_mb=0.001)
+    assert not packs.empty and set(packs['Pack Size']) == {2}
+    assert packs.attrs['note'] == itemsets.attrs['stopped']
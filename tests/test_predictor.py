@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.predictor import _fit_products, predict_top5_products_next30days
+
+
+def _sales(timestamped):
+    """60 days of 3 rows/day x 7 units for 5 products, optionally at random times of day."""
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2024-01-01', periods=60)
+    rows = [(day, f"Product {p}") for day in days for p in range(5) for _ in range(3)]
+    df = pd.DataFrame(rows, columns=['Date', 'Product'])
+    if timestamped:
+        df['Date'] += pd.to_timedelta(rng.integers(0, 86400, len(df)), unit='s')
+    df['Category'] = 'General'
+    df['Quantity'] = 7
+    df['Price'] = 10.0
+    df['Revenue'] = 70.0
+    df['Customer_Gender'] = 'Unknown'
+    df['Age_Group'] = 'Unknown'
+    return df
+
+
+def test_fast_forecast_ignores_time_of_day():
+    plain, _ = predict_top5_products_next30days(_sales(False), backend='fast')
+    stamped, _ = predict_top5_products_next30days(_sales(True), backend='fast')
+
+    # 21 units a day -> 630 over the 30-day horizon, for every product
+    assert plain['Predicted_Units_Next30Days'].between(620, 635).all()
+    assert stamped['Predicted_Units_Next30Days'].tolist() == plain['Predicted_Units_Next30Days'].tolist()
+
+
+def _sleepy_fit(seconds, periods):
+    """Stands in for a Prophet fit: sleeps, fails on a negative value, else returns seconds * periods."""
+    if seconds < 0:
+        raise ValueError('fit failed')
+    time.sleep(seconds)
+    return seconds * periods
+
+
+def test_fits_keep_input_order_and_skip_failures():
+    done = []
+    results = _fit_products({'a': 0.3, 'b': -1, 'c': 0.0, 'd': 0.1}, max_workers=3, timeout=30, periods=10,
+                            on_done=lambda: done.append(1), fit=_sleepy_fit)
+
+    assert list(results) == ['a', 'c', 'd']
+    assert results == {'a': 3.0, 'c': 0.0, 'd': 1.0}
+    assert len(done) == 4
+
+
+def test_timeout_counts_per_product_and_kills_stuck_fits():
+    start = time.monotonic()
+    # One worker: the stuck fit is killed at its own deadline and the queued ones still get a full timeout
+    results = _fit_products({'stuck': 60, 'x': 0.6, 'y': 0.6}, max_workers=1, timeout=1, periods=1,
+                            fit=_sleepy_fit)
+
+    assert results == {'x': 0.6, 'y': 0.6}
+    assert time.monotonic() - start < 10
+    assert multiprocessing.active_children() == []
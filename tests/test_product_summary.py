@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from src.product_summary import build_product_summary
+
+
+def _sales():
+    rng = np.random.default_rng(1)
+    n = 500
+    return pd.DataFrame({
+        'Product': rng.choice(['Lamp', 'Desk', 'Chair', 'Mug'], n),
+        'Category': 'Home',
+        'Quantity': rng.integers(1, 5, n),
+        'Price': rng.uniform(5, 50, n).round(2),
+        'Revenue': rng.uniform(5, 200, n).round(2),
+        'Customer_Gender': rng.choice(['Male', 'Female', 'Unknown', 'm'], n),
+        'Age_Group': rng.choice(['18-24', '25-34', '35-44'], n),
+    })
+
+
+def test_summary_matches_per_product_filtering():
+    df = _sales()
+    summary = build_product_summary(df)
+
+    assert list(summary.index) == sorted(df['Product'].unique())
+    for product, rows in df.groupby('Product'):
+        row = summary.loc[product]
+        assert np.isclose(row['Revenue'], rows['Revenue'].sum())
+        assert row['Quantity'] == rows['Quantity'].sum()
+        assert np.isclose(row['Price'], rows['Price'].mean())
+        assert row['Rows'] == len(rows)
+        assert row['Male_Count'] == rows['Customer_Gender'].str.lower().isin(['male', 'm']).sum()
+        assert row['Female_Count'] == (rows['Customer_Gender'] == 'Female').sum()
+        ages = rows['Age_Group'].value_counts()
+        assert row['Top_Age_Count'] == ages.max()
+        assert row['Top_Age_Group'] in set(ages[ages == ages.max()].index)
+
+
+def test_summary_of_empty_frame_has_the_columns():
+    summary = build_product_summary(pd.DataFrame(columns=['Product', 'Revenue']))
+    assert summary.empty and 'Top_Age_Group' in summary.columns
+
+
+def test_categorical_product_column_gives_the_same_summary():
+    df = _sales()
+    compact = df.astype({'Product': 'category', 'Category': 'category', 'Age_Group': 'category'})
+    pd.testing.assert_frame_equal(build_product_summary(compact), build_product_summary(df),
+                                  check_index_type=False, check_dtype=False, check_categorical=False)